@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+نقطة دخول واحدة لكل أوامر الـ pipeline:
+
+  python -m scripts predict [15 60 240] [--shard i/N] [--dry-run]
+  python -m scripts evaluate [--shard i/N]
+  python -m scripts summarize [--shard i/N | merge]
+  python -m scripts fetch-history
+  python -m scripts train
+  python -m scripts resample | replay | serve | stream | storage | universe ...
+
+إعدادات مشتركة قبل اسم الأمر (انظر settings.py):
+  python -m scripts --horizons 15,60,240 --backend sqlite predict
+
+كل أمر يستورد وحدته فقط عند تشغيله، فالمكتبات الثقيلة (requests / numpy / sqlite3)
+لا تُحمّل إلا للأوامر التي تحتاجها.
+
+--import-profile: يعيد تشغيل الأمر مع python -X importtime ويطبع أغلى الـ imports.
+                  الأمر نفسه يُشغَّل فقط مع --dry-run (4 مرات)؛ بدونه نقيس import وحدته فقط
+                  حتى لا تتكرر طلبات الشبكة والكتابة على data/.
+--budget-ms N:     (مع --import-profile) يخرج بكود 1 لو تجاوز زمن البدء البارد N ms.
+  python -m scripts --import-profile --budget-ms 250 predict --dry-run
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path:
+    # السكربتات تستورد بعضها كوحدات مسطحة (from records import ...)
+    sys.path.insert(0, HERE)
+
+import settings  # noqa: E402
+
+# الأمر -> (الوحدة، الوصف). كل وحدة فيها main() تقرأ sys.argv
+COMMANDS = {
+    "predict": ("run_predict", "write one prediction per symbol/horizon slot"),
+    "evaluate": ("evaluate", "resolve due Pending predictions"),
+    "summarize": ("summarize", "write 24h hit-rate summaries (or merge shard outputs)"),
+    "fetch-history": ("fetch_history", "refresh data/<SYM>/raw_1m.jsonl"),
+    "train": ("train", "fit logistic models into data/models (needs requests, numpy)"),
+    "resample": ("resample", "rebuild data/<SYM>/ohlc_<tf>.jsonl bars (needs numpy)"),
+    "replay": ("replay", "replay the pipeline on a virtual clock"),
+    "serve": ("serve", "local query API with ETags and deltas"),
+    "stream": ("stream_klines", "WebSocket 1m kline ingester"),
+    "storage": ("storage", "import/export between JSONL and SQLite"),
+    "universe": ("universe", "print the symbol universe / save an exchangeInfo snapshot"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    lines = "\n".join(f"  {name:<14} {desc}" for name, (_, desc) in COMMANDS.items())
+    ap = argparse.ArgumentParser(
+        prog="python -m scripts",
+        description="Crypto predictor pipeline",
+        epilog=f"commands:\n{lines}",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    ap.add_argument("--config", default=None, help="settings file (default: config/pipeline.json)")
+    ap.add_argument("--data", default=None, help="data root (DATA_ROOT)")
+    ap.add_argument("--symbols", default=None, help="comma list (SYMBOLS)")
+    ap.add_argument("--horizons", default=None, help="comma list, e.g. 15,60,240 (HORIZON_MINUTES)")
+    ap.add_argument("--backend", choices=("jsonl", "sqlite"), default=None, help="STORAGE_BACKEND")
+    ap.add_argument("--seed", default=None, help="PREDICT_SEED for the tie-break jitter")
+    ap.add_argument("--import-profile", action="store_true", help="report import time for the command")
+    ap.add_argument("--budget-ms", type=float, default=None, help="with --import-profile: fail over this cold start")
+    ap.add_argument("command", choices=sorted(COMMANDS), metavar="command")
+    ap.add_argument("args", nargs=argparse.REMAINDER)
+    return ap
+
+
+# ----------------- import profile -----------------
+
+
+def _parse_importtime(stderr: str):
+    """
+    سطور "import time: self | cumulative | name" -> [(cum_us, self_us, depth, name)].
+    """
+    rows = []
+    for ln in stderr.splitlines():
+        if not ln.startswith("import time:") or "self [us]" in ln:
+            continue
+        try:
+            head, cum, raw = ln.split("|", 2)
+            self_us = int(head.split(":", 1)[1])
+            cum_us = int(cum)
+        except ValueError:
+            continue
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        rows.append((cum_us, self_us, depth, raw.strip()))
+    return rows
+
+
+def _cold_start_ms(cmd, env, runs: int = 3) -> float:
+    import subprocess
+
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        best = min(best, (time.perf_counter() - t0) * 1000)
+    return best
+
+
+def import_profile(argv, budget_ms=None, top: int = 15, module=None) -> int:
+    """
+    module: لو محدد نقيس "import settings, <module>" فقط بدل تشغيل الأمر
+    (للأوامر بدون --dry-run التي تكتب ملفات أو تطلب الشبكة).
+    """
+    import subprocess
+
+    if module is None:
+        target = [os.path.abspath(__file__)] + argv
+        label = " ".join(argv)
+    else:
+        target = ["-c", f"import sys; sys.path.insert(0, {HERE!r}); import settings, {module}"]
+        label = f"import {module} (no --dry-run: command not run)"
+    env = dict(os.environ)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime"] + target,
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False,
+    )
+    sys.stdout.write(proc.stdout)
+    rows = _parse_importtime(proc.stderr)
+    roots = sorted((r for r in rows if r[2] == 0), reverse=True)
+    total = sum(r[0] for r in roots)
+    print(f"[cli] import profile: {label}")
+    print(f"[cli] {'cumulative ms':>14} {'self ms':>8}  module")
+    for cum_us, self_us, _, name in roots[:top]:
+        print(f"[cli] {cum_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+    print(f"[cli] {len(rows)} modules, {total / 1000:.1f} ms in top-level imports")
+
+    cold = _cold_start_ms([sys.executable] + target, env)
+    print(f"[cli] cold start (best of 3): {cold:.0f} ms")
+    if proc.returncode:
+        print(f"[cli] command exited with {proc.returncode}")
+        return proc.returncode
+    if budget_ms is not None and cold > budget_ms:
+        print(f"[cli] FAIL: cold start {cold:.0f} ms > budget {budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+# ----------------- main -----------------
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = build_parser().parse_args(argv)
+
+    settings.apply(
+        settings.load_config(args.config),
+        {
+            "data": args.data,
+            "symbols": args.symbols,
+            "horizons": args.horizons,
+            "backend": args.backend,
+            "seed": args.seed,
+        },
+    )
+
+    if args.import_profile:
+        child = [a for a in argv if a not in ("--import-profile",)]
+        if args.budget_ms is not None:
+            i = child.index("--budget-ms") if "--budget-ms" in child else -1
+            child = child[:i] + child[i + 2:] if i >= 0 else [a for a in child if not a.startswith("--budget-ms=")]
+        module = None if "--dry-run" in args.args else COMMANDS[args.command][0]
+        return import_profile(child, args.budget_ms, module=module)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    sys.argv = [f"scripts {args.command}"] + args.args
+    result = module.main()
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+clock.py
+
+"الآن" المشترك لسكربتات الـ pipeline (predict / evaluate / summarize).
+الافتراضي time.time؛ replay.py يحقن VirtualClock ليمر على أسابيع من الفتحات
+الزمنية بدون انتظار.
+
+    import clock
+    now_ms = clock.now_ms()
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+_now: Callable[[], float] = time.time
+
+
+def now() -> float:
+    return _now()
+
+
+def now_ms() -> int:
+    return int(_now() * 1000)
+
+
+def set_clock(fn: Callable[[], float]) -> Callable[[], float]:
+    """
+    fn ترجع ثوانٍ (مثل time.time). ترجع الساعة السابقة.
+    """
+    global _now
+    prev, _now = _now, fn
+    return prev
+
+
+@contextmanager
+def use_clock(fn: Callable[[], float]) -> Iterator[Callable[[], float]]:
+    prev = set_clock(fn)
+    try:
+        yield fn
+    finally:
+        set_clock(prev)
+
+
+class VirtualClock:
+    """
+    ساعة افتراضية لا تتحرك إلا بـ set / advance.
+    """
+
+    def __init__(self, start: float) -> None:
+        self.t = float(start)
+
+    def __call__(self) -> float:
+        return self.t
+
+    def now_ms(self) -> int:
+        return int(self.t * 1000)
+
+    def set(self, t: float) -> None:
+        self.t = float(t)
+
+    def advance(self, seconds: float) -> None:
+        self.t += seconds
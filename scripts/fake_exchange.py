@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+fake_exchange.py
+
+بورصة محلية بديلة (stdlib فقط) للاختبار بدون إنترنت. تقدّم شموع 1m المسجلة
+في data/<SYM>/raw_1m.jsonl بنفس شكل ردود Binance و CryptoCompare:
+
+  GET /api/v3/klines?symbol=BTCUSDT&interval=1m&limit=120[&endTime=..]
+  GET /api/v3/ticker/price?symbol=BTCUSDT
+  GET /data/v2/histominute?fsym=BTC&tsym=USD&limit=720
+  WS  /stream?streams=btcusdt@kline_1m/ethusdt@kline_1m   (combined stream)
+
+- يحسب الـ weight لكل دقيقة ويرجعه في X-MBX-USED-WEIGHT-1M.
+- لو تجاوز weight_limit يرد 429 مع Retry-After (مثل Binance).
+- delay: تأخير مصطنع لكل طلب (ثوانٍ) لاختبار الـ latency.
+- replay_speed: يعيد تشغيل الشموع المسجلة بسرعة (ثوانٍ حقيقية لكل دقيقة)؛
+  الـ REST والـ WebSocket يريان نفس "الآن" الافتراضي.
+- ws_drop_after: يقطع اتصال الـ WebSocket بعد N رسالة (لاختبار إعادة الاتصال).
+
+التشغيل:
+  python scripts/fake_exchange.py --port 9900 --weight-limit 120
+  python scripts/fake_exchange.py --port 9900 --replay-speed 0.5
+"""
+
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import settings
+import wsproto
+
+MINUTE_MS = 60 * 1000
+KLINES_WEIGHT = 2
+TICKER_WEIGHT = 2
+
+
+def load_candles(data_root: str) -> Dict[str, Tuple[List[int], List[float]]]:
+    """
+    symbol -> (ts, closes) مرتبة حسب الوقت من raw_1m.jsonl.
+    """
+    out: Dict[str, Tuple[List[int], List[float]]] = {}
+    if not os.path.isdir(data_root):
+        return out
+    for sym in sorted(os.listdir(data_root)):
+        path = os.path.join(data_root, sym, "raw_1m.jsonl")
+        if not os.path.exists(path):
+            continue
+        rows = []
+        with open(path, "r", encoding="utf-8") as f:
+            for ln in f:
+                ln = ln.strip()
+                if not ln:
+                    continue
+                try:
+                    d = json.loads(ln)
+                    rows.append((int(d["t"]), float(d["c"])))
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    continue
+        rows.sort()
+        if rows:
+            out[sym] = ([r[0] for r in rows], [r[1] for r in rows])
+    return out
+
+
+class FakeExchange:
+    def __init__(
+        self,
+        data_root: str,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        weight_limit: int = 6000,
+        delay: float = 0.0,
+        clock: Optional[Callable[[], int]] = None,
+        replay_speed: Optional[float] = None,
+        replay_start: Optional[int] = None,
+        ws_drop_after: int = 0,
+    ) -> None:
+        """
+        clock: دالة ترجع "الآن" بالـ ms؛ الشموع بعده لا تُقدَّم (للـ replay).
+        replay_speed: بديل لـ clock: ثوانٍ حقيقية لكل دقيقة افتراضية تبدأ من
+        replay_start (افتراضياً بعد ساعة من أول شمعة).
+        بدون الاثنين نقدّم حتى آخر شمعة مسجلة.
+        """
+        self.candles = load_candles(data_root)
+        self.weight_limit = weight_limit
+        self.delay = delay
+        self.ws_drop_after = ws_drop_after
+        self.ws_messages = 0
+        if clock is None and replay_speed:
+            if replay_start is None:
+                firsts = [ts[0] for ts, _ in self.candles.values()]
+                replay_start = (min(firsts) if firsts else 0) + 60 * MINUTE_MS
+            wall0 = time.time()
+            start = int(replay_start)
+            clock = lambda: start + int((time.time() - wall0) / replay_speed * MINUTE_MS)  # noqa: E731
+        self.clock = clock
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._window = 0
+        self._used = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeExchange":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeExchange":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ----------------- البيانات -----------------
+
+    def now_ms(self) -> int:
+        if self.clock is not None:
+            return int(self.clock())
+        return int(time.time() * 1000)
+
+    def window(self, symbol: str, end_ms: Optional[int], limit: int) -> List[Tuple[int, float]]:
+        series = self.candles.get(symbol)
+        if not series:
+            return []
+        ts, closes = series
+        if end_ms is None:
+            end_ms = self.now_ms() if self.clock is not None else ts[-1]
+        hi = bisect_right(ts, end_ms)
+        lo = max(0, hi - limit)
+        return list(zip(ts[lo:hi], closes[lo:hi]))
+
+    def charge(self, weight: int) -> Tuple[bool, int, float]:
+        """
+        يرجع (allowed, used_weight, retry_after_sec) لنافذة الدقيقة الحالية.
+        """
+        now = time.time()
+        minute = int(now // 60)
+        with self._lock:
+            self.requests += 1
+            if minute != self._window:
+                self._window = minute
+                self._used = 0
+            self._used += weight
+            allowed = self._used <= self.weight_limit
+            return allowed, self._used, (minute + 1) * 60 - now
+
+    # ----------------- HTTP -----------------
+
+    def _handler_class(self):
+        ex = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):  # noqa: D401
+                pass
+
+            def _json(self, status: int, obj, headers: Optional[Dict[str, str]] = None) -> None:
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):  # noqa: N802
+                if ex.delay:
+                    time.sleep(ex.delay)
+                url = urlsplit(self.path)
+                qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if self.headers.get("Upgrade", "").lower() == "websocket":
+                    self._websocket(url.path, qs)
+                elif url.path.startswith("/api/v3/"):
+                    self._binance(url.path, qs)
+                elif url.path == "/data/v2/histominute":
+                    self._cryptocompare(qs)
+                else:
+                    self._json(404, {"code": -1, "msg": "not found"})
+
+            def _binance(self, path: str, qs: Dict[str, str]) -> None:
+                weight = KLINES_WEIGHT if path == "/api/v3/klines" else TICKER_WEIGHT
+                allowed, used, retry_after = ex.charge(weight)
+                hdrs = {"X-MBX-USED-WEIGHT-1M": str(used)}
+                if not allowed:
+                    hdrs["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+                    self._json(429, {"code": -1003, "msg": "Too many requests"}, hdrs)
+                    return
+                sym = qs.get("symbol", "").upper()
+                if sym not in ex.candles:
+                    self._json(400, {"code": -1121, "msg": "Invalid symbol."}, hdrs)
+                    return
+                if path == "/api/v3/ticker/price":
+                    rows = ex.window(sym, None, 1)
+                    self._json(200, {"symbol": sym, "price": f"{rows[-1][1]:.8f}"} if rows else {}, hdrs)
+                    return
+                if path != "/api/v3/klines":
+                    self._json(404, {"code": -1, "msg": "not found"}, hdrs)
+                    return
+                limit = min(1000, int(qs.get("limit", 500)))
+                end = int(qs["endTime"]) if "endTime" in qs else None
+                rows = ex.window(sym, end, limit)
+                if "startTime" in qs:
+                    start = int(qs["startTime"])
+                    rows = [r for r in rows if r[0] >= start]
+                out = []
+                for t, c in rows:
+                    s = f"{c:.8f}"
+                    out.append([t, s, s, s, s, "0", t + MINUTE_MS - 1, "0", 0, "0", "0", "0"])
+                self._json(200, out, hdrs)
+
+            def _cryptocompare(self, qs: Dict[str, str]) -> None:
+                sym = qs.get("fsym", "").upper() + "USDT"
+                limit = int(qs.get("limit", 100)) + 1  # CryptoCompare يرجع limit+1 نقطة
+                end = int(qs["toTs"]) * 1000 if "toTs" in qs else None
+                rows = ex.window(sym, end, limit)
+                if not rows:
+                    self._json(200, {"Response": "Error", "Message": "no data", "Data": {}})
+                    return
+                data = [
+                    {"time": t // 1000, "high": c, "low": c, "open": c, "close": c,
+                     "volumefrom": 0, "volumeto": 0}
+                    for t, c in rows
+                ]
+                self._json(200, {"Response": "Success", "Data": {"Data": data}})
+
+            def _websocket(self, path: str, qs: Dict[str, str]) -> None:
+                key = self.headers.get("Sec-WebSocket-Key", "")
+                try:
+                    ok = len(base64.b64decode(key)) == 16
+                except ValueError:
+                    ok = False
+                if path not in ("/stream", "/stream/") or not ok:
+                    self._json(400, {"code": -1, "msg": "bad websocket request"})
+                    return
+                streams = [s for s in qs.get("streams", "").split("/") if s.endswith("@kline_1m")]
+                symbols = [s.split("@", 1)[0].upper() for s in streams]
+                self.send_response(101, "Switching Protocols")
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", wsproto.accept_key(key))
+                self.end_headers()
+                self.wfile.flush()
+                self.close_connection = True
+                ex._replay_stream(self.wfile, symbols)
+
+        return Handler
+
+    def _replay_stream(self, wfile, symbols: List[str]) -> None:
+        """
+        يرسل حدث kline مغلق لكل شمعة تنغلق على الساعة الافتراضية.
+        """
+        sent = 0
+        last = {s: self.now_ms() // MINUTE_MS * MINUTE_MS - MINUTE_MS for s in symbols}
+        try:
+            while True:
+                now = self.now_ms()
+                for sym in symbols:
+                    series = self.candles.get(sym)
+                    if not series:
+                        continue
+                    ts, closes = series
+                    lo = bisect_right(ts, last[sym])
+                    while lo < len(ts) and ts[lo] + MINUTE_MS <= now:
+                        t, c = ts[lo], closes[lo]
+                        s = f"{c:.8f}"
+                        event = {
+                            "stream": f"{sym.lower()}@kline_1m",
+                            "data": {
+                                "e": "kline", "E": t + MINUTE_MS, "s": sym,
+                                "k": {"t": t, "T": t + MINUTE_MS - 1, "s": sym, "i": "1m",
+                                      "o": s, "h": s, "l": s, "c": s, "v": "0", "x": True},
+                            },
+                        }
+                        wfile.write(wsproto.encode_frame(wsproto.OP_TEXT, json.dumps(event).encode(), mask=False))
+                        wfile.flush()
+                        last[sym] = t
+                        lo += 1
+                        sent += 1
+                        with self._lock:
+                            self.ws_messages += 1
+                        if self.ws_drop_after and sent >= self.ws_drop_after:
+                            return
+                if self.clock is None:
+                    return
+                time.sleep(0.01)
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            return
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Local stand-in exchange serving recorded 1m candles")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9900)
+    ap.add_argument("--data", default=settings.data_root())
+    ap.add_argument("--weight-limit", type=int, default=6000)
+    ap.add_argument("--delay", type=float, default=0.0)
+    ap.add_argument("--replay-speed", type=float, default=None, help="real seconds per simulated minute")
+    ap.add_argument("--ws-drop-after", type=int, default=0)
+    args = ap.parse_args()
+    ex = FakeExchange(
+        args.data, args.host, args.port, args.weight_limit, args.delay,
+        replay_speed=args.replay_speed, ws_drop_after=args.ws_drop_after,
+    )
+    print(f"[fake_exchange] serving {len(ex.candles)} symbols on {ex.base_url}", flush=True)
+    try:
+        ex._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
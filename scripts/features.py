@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+features.py
+
+نسخة batch من run_predict.build_features: نفس الـ features لكل العملات مرة واحدة
+بـ numpy بدل حلقات Python لكل عملة.
+
+- المدخل: مصفوفة closes بشكل (symbols × minutes) محاذاة لليمين (آخر عمود = آخر سعر)،
+  والعملات ذات التاريخ القصير مبطّنة بـ NaN من اليسار (close_matrix تبنيها).
+- نفس التعريفات حرفياً: نافذة آخر 60 قيمة، EMA تبدأ من أول قيمة في النافذة،
+  sigma انحراف معياري للمجتمع (أو 0.0005)، RSI على آخر 15 قيمة (أو 50).
+- الـ EMA تكرارية، فنمر على أعمدة النافذة (60 خطوة) لكن كل خطوة vectorized
+  على كل العملات.
+- النتائج تطابق build_features ضمن خطأ التقريب (~1 ULP، غالباً في sigma)، وليس
+  bit-for-bit؛ tests/test_features.py يقارن بـ rel_tol=1e-12.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+WINDOW = 60
+RSI_PERIOD = 14
+SIGMA_FLOOR = 0.0005
+FEATURE_KEYS = ("rsi", "s5", "s15", "momentum", "lastRet", "sigma")
+
+
+def close_matrix(series: Sequence[Sequence[float]], width: int = WINDOW) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    قائمة closes لكل عملة -> (matrix بعرض width محاذاة لليمين مع NaN، lengths).
+    """
+    m = np.full((len(series), width), np.nan)
+    lengths = np.zeros(len(series), dtype=np.int64)
+    for i, closes in enumerate(series):
+        tail = closes[-width:]
+        n = len(tail)
+        if n:
+            m[i, width - n:] = tail
+        lengths[i] = n
+    return m, lengths
+
+
+def _ema_last_two(x: np.ndarray, start: np.ndarray, span: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    EMA لكل صف تبدأ من العمود start[i]؛ يرجع (آخر قيمة، القيمة قبلها).
+    """
+    k = 2.0 / (span + 1.0)
+    rows, cols = x.shape
+    e = np.full(rows, np.nan)
+    prev = np.full(rows, np.nan)
+    for j in range(cols):
+        col = x[:, j]
+        prev = e
+        seeded = start == j
+        e = np.where(seeded, col, np.where(start < j, col * k + e * (1.0 - k), e))
+    return e, prev
+
+
+def _row_sums(a: np.ndarray) -> np.ndarray:
+    """
+    مجموع كل صف من اليسار لليمين كما يفعل sum() في Python (3.11)، وليس
+    الجمع الزوجي في numpy. يقرّب النتائج من build_features لكن لا يضمن تطابقها
+    حتى آخر bit (تبقى فروق ~1 ULP في sigma، و sum() في 3.12+ يجمع بتعويض).
+    """
+    total = np.zeros(a.shape[0])
+    for j in range(a.shape[1]):
+        total = total + a[:, j]
+    return total
+
+
+def batch_features(closes: np.ndarray, lengths: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    closes: (S, T) محاذاة لليمين. lengths: عدد القيم الصالحة لكل صف
+    (افتراضياً من عدد القيم غير NaN). الصفوف بطول 0 ترجع NaN.
+    """
+    x = np.asarray(closes, dtype=np.float64)
+    if x.ndim != 2:
+        raise ValueError(f"closes must be 2-D (symbols x minutes), got shape {x.shape}")
+    if x.shape[1] > WINDOW:
+        x = x[:, -WINDOW:]
+    rows, cols = x.shape
+    if lengths is None:
+        n = np.count_nonzero(~np.isnan(x), axis=1)
+    else:
+        n = np.minimum(np.asarray(lengths, dtype=np.int64), cols)
+    start = cols - n
+    idx = np.arange(cols)
+    valid = idx[None, :] >= start[:, None]
+    x = np.where(valid, x, np.nan)
+    last = x[:, -1]
+
+    ema5, ema5_prev = _ema_last_two(x, start, 5)
+    ema15, ema15_prev = _ema_last_two(x, start, 15)
+    has_two = n >= 2
+    s5 = np.where(has_two, ema5 - ema5_prev, 0.0)
+    s15 = np.where(has_two, ema15 - ema15_prev, 0.0)
+
+    first = x[np.arange(rows), np.minimum(start, cols - 1)]
+    momentum = last / first - 1.0
+
+    # العوائد: زوج صالح فقط لو العمودان داخل النافذة
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rets = x[:, 1:] / x[:, :-1] - 1.0
+    rvalid = valid[:, 1:] & valid[:, :-1]
+    cnt = np.count_nonzero(rvalid, axis=1)
+    safe_cnt = np.maximum(cnt, 1)
+    r0 = np.where(rvalid, rets, 0.0)
+    mean = _row_sums(r0) / safe_cnt
+    var = _row_sums(np.where(rvalid, (rets - mean[:, None]) ** 2, 0.0)) / safe_cnt
+    sigma = np.sqrt(var)
+    sigma = np.where((cnt == 0) | (sigma == 0.0), SIGMA_FLOOR, sigma)
+    last_ret = np.where(cnt > 0, rets[:, -1] if cols > 1 else 0.0, 0.0)
+
+    # RSI على آخر 15 قيمة (14 فرق)
+    if cols > RSI_PERIOD:
+        d = np.diff(x[:, -(RSI_PERIOD + 1):], axis=1)
+        gains = _row_sums(np.where(d >= 0, d, 0.0))
+        losses = _row_sums(np.where(d < 0, -d, 0.0))
+        avg_g = gains / float(RSI_PERIOD)
+        avg_l = losses / float(RSI_PERIOD)
+        avg_l = np.where(avg_l == 0.0, 1e-6, avg_l)
+        rsi = 100.0 - 100.0 / (1.0 + avg_g / avg_l)
+    else:
+        rsi = np.full(rows, 50.0)
+    rsi = np.where(n >= RSI_PERIOD + 1, rsi, 50.0)
+
+    out = {"rsi": rsi, "s5": s5, "s15": s15, "momentum": momentum, "lastRet": last_ret, "sigma": sigma}
+    empty = n == 0
+    if empty.any():
+        out = {k: np.where(empty, np.nan, v) for k, v in out.items()}
+    return out
+
+
+def feature_rows(feats: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    """
+    أعمدة -> dict لكل عملة بنفس شكل build_features (لـ predict_simple).
+    """
+    cols = [feats[k].tolist() for k in FEATURE_KEYS]
+    return [dict(zip(FEATURE_KEYS, vals)) for vals in zip(*cols)]
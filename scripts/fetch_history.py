@@ -1,49 +1,32 @@
 #!/usr/bin/env python3
-import os, json, time, urllib.request, urllib.error
+import os, json
 
-BASES = ["BTC","ETH","XRP","BNB","SOL","DOGE","ADA","LTC","SHIB","PUMP"]
-SYMBOLS = [b + "USDT" for b in BASES]
+import settings
+from fileio import atomic_write, locked
+from price_sources import PRICES, PriceSourceError
+from ratelimit import PRIORITY_HISTORY
+from universe import shard_symbols
 
-API_URL = "https://min-api.cryptocompare.com/data/v2/histominute"
 
-# عدد النقاط لكل عملة (مثلاً 720 ≈ 12 ساعة، 1440 ≈ يوم كامل)
-LIMIT = 720
+# عدد النقاط لكل عملة (مثلاً 720 ≈ 12 ساعة، 1440 ≈ يوم كامل). run_predict يقرأ نفس
+# HISTORY_MINUTES ليعرف أي آفاق طويلة يغطيها التاريخ المحلي.
+LIMIT = int(os.getenv("HISTORY_MINUTES", "720"))
 
 def fetch_hist_minute(symbol: str):
-    base = symbol.replace("USDT", "")
-    url = f"{API_URL}?fsym={base}&tsym=USD&limit={LIMIT}&aggregate=1"
-    print(f"[fetch_history] Fetching {symbol} from {url}")
+    print(f"[fetch_history] Fetching {symbol} ({LIMIT} rows)")
     try:
-        with urllib.request.urlopen(url, timeout=20) as resp:
-            raw = resp.read().decode("utf-8")
-        data = json.loads(raw)
-    except (urllib.error.URLError, json.JSONDecodeError) as e:
+        # t بالـ ms مثل ما نستخدم في الواجهة
+        return PRICES.klines_1m(symbol, LIMIT + 1, PRIORITY_HISTORY, prefer="cryptocompare")
+    except PriceSourceError as e:
         print(f"[fetch_history] ERROR {symbol}: {e}")
         return []
 
-    if not data.get("Data") or not data["Data"].get("Data"):
-        print(f"[fetch_history] No data for {symbol}")
-        return []
-
-    out = []
-    for p in data["Data"]["Data"]:
-        # p: {time, high, low, open, close, volumefrom, volumeto}
-        t = p.get("time")
-        c = p.get("close")
-        if t is None or c is None:
-            continue
-        out.append({
-            "t": int(t) * 1000,   # ms timestamp مثل ما نستخدم في الواجهة
-            "c": float(c)
-        })
-    return out
-
 def main():
-    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_root = os.path.join(root, "data")
+    data_root = settings.data_root()
     os.makedirs(data_root, exist_ok=True)
 
-    for sym in SYMBOLS:
+    symbols, _, _ = shard_symbols()
+    for sym in symbols:
         hist = fetch_hist_minute(sym)
         if not hist:
             continue
@@ -54,13 +37,9 @@ def main():
         out_path = os.path.join(sym_dir, "raw_1m.jsonl")
         print(f"[fetch_history] Writing {len(hist)} rows to {out_path}")
 
-        # نكتب الملف بالكامل في كل مرة (بسيط وواضح الآن)
-        with open(out_path, "w", encoding="utf-8") as f:
-            for row in hist:
-                f.write(json.dumps(row) + "\n")
-
-        # نرتاح ثانية بين كل عملة (احتياط لمحدودية الـ API المجانية)
-        time.sleep(1)
+        # نكتب الملف بالكامل في كل مرة (atomic، وتحت قفل حتى لا نضيّع append من الـ stream)
+        with locked(out_path):
+            atomic_write(out_path, "".join(json.dumps(row) + "\n" for row in hist))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+fileio.py
+
+كتابة آمنة لملفات data/ حتى تعمل السكربتات (predict / evaluate / summarize / stream)
+بالتوازي على نفس الملفات:
+
+- atomic_write: temp في نفس المجلد + fsync + os.replace، فالقارئ يرى الملف
+  القديم أو الجديد كاملاً، وانهيار أثناء الكتابة لا يترك ملفاً مقطوعاً.
+- append_text: O_APPEND بـ write واحدة للسطر (أو الدفعة) كاملاً.
+- locked: قفل fcntl استشاري على ملف جانبي .<name>.lock (لأن rename يغيّر الـ inode):
+    الإضافة      -> قفل مشترك (عدة كتّاب append معاً)
+    إعادة الكتابة -> قفل حصري حول read-modify-write كاملة
+  القراءة فقط لا تحتاج قفلاً. بدون fcntl (Windows) القفل لا يفعل شيئاً.
+
+ملاحظة: flock لا يُعاد دخوله؛ لا تستدعِ append_text داخل locked() لنفس الملف.
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+def lock_path(path: str) -> str:
+    d, name = os.path.split(os.path.abspath(path))
+    return os.path.join(d, f".{name}.lock")
+
+
+@contextmanager
+def locked(path: str, shared: bool = False) -> Iterator[None]:
+    """
+    قفل استشاري على path (حصري افتراضياً). يُنشئ المجلد لو غير موجود.
+    """
+    if fcntl is None:
+        yield
+        return
+    lp = lock_path(path)
+    os.makedirs(os.path.dirname(lp), exist_ok=True)
+    fd = os.open(lp, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # يحرر القفل
+
+
+def _fsync_dir(d: str) -> None:
+    try:
+        fd = os.open(d, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, data: Union[str, bytes]) -> None:
+    """
+    يستبدل path بالمحتوى كاملاً. لا يأخذ قفلاً: المستدعي يحيط الـ
+    read-modify-write بـ locked(path) عند الحاجة.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    d, name = os.path.split(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=d)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(d)
+
+
+def atomic_write_json(path: str, doc: Any, **kw: Any) -> None:
+    kw.setdefault("ensure_ascii", False)
+    atomic_write(path, json.dumps(doc, **kw))
+
+
+def append_text(path: str, data: Union[str, bytes], lock: bool = True) -> None:
+    """
+    إضافة بـ O_APPEND و write واحدة (مع إكمال الجزء المتبقي لو write قصيرة)
+    تحت قفل مشترك حتى لا تضيع أثناء إعادة كتابة حصرية.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if not data:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with (locked(path, shared=True) if lock else _nolock()):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                n = os.write(fd, view)
+                view = view[n:]
+        finally:
+            os.close(fd)
+
+
+@contextmanager
+def _nolock() -> Iterator[None]:
+    yield
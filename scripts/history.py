@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+history.py
+
+مخزن شموع 1m لكل عملة: data/<SYM>/raw_1m.jsonl
+
+كل سطر: {"t": ms, "c": close} وقد يحتوي أيضاً o / h / l / v
+(الـ stream يكتب OHLCV كاملة، و fetch_history يكتب t و c فقط).
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+from fileio import append_text
+
+RAW_NAME = "raw_1m.jsonl"
+MINUTE_MS = 60 * 1000
+CANDLE_KEYS = ("t", "o", "h", "l", "c", "v")
+
+# الإطار -> عدد الدقائق (resample.py يجمع إليها؛ هنا بدون numpy حتى يبقى predict خفيفاً)
+TIMEFRAMES = {"1m": 1, "5m": 5, "15m": 15, "1h": 60, "4h": 240, "1d": 1440}
+
+
+def timeframe_minutes(tf) -> int:
+    if isinstance(tf, int):
+        return tf
+    if tf not in TIMEFRAMES:
+        raise ValueError(f"unknown timeframe {tf!r} (expected one of {', '.join(TIMEFRAMES)})")
+    return TIMEFRAMES[tf]
+
+
+def timeframe_for_horizon(horizon_min: int) -> int:
+    """
+    الإطار الذي تُحسب عليه الـ features لأفق معيّن (بالدقائق).
+    حتى 60 دقيقة نبقى على 1m (نفس السلوك القديم)؛ بعدها أكبر إطار
+    لا يتجاوز horizon/15 حتى يبقى في نافذة الـ features عدة آفاق.
+    """
+    if horizon_min <= 60:
+        return 1
+    best = 1
+    for m in sorted(TIMEFRAMES.values()):
+        if m <= horizon_min // 15:
+            best = m
+    return best
+
+
+def history_path(data_root: str, symbol: str) -> str:
+    return os.path.join(str(data_root), symbol, RAW_NAME)
+
+
+def read_candles(path: str) -> List[Dict[str, float]]:
+    rows: List[Dict[str, float]] = []
+    if not os.path.exists(path):
+        return rows
+    with open(path, "r", encoding="utf-8") as f:
+        for ln in f:
+            ln = ln.strip()
+            if not ln:
+                continue
+            try:
+                d = json.loads(ln)
+            except json.JSONDecodeError:
+                continue
+            if "t" in d and "c" in d:
+                rows.append(d)
+    return rows
+
+
+def _last_line(path: str, chunk: int = 4096) -> Optional[str]:
+    """
+    يقرأ آخر سطر غير فارغ من نهاية الملف بدون قراءة الملف كله.
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > 0:
+            step = min(chunk, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+            lines = [ln for ln in buf.split(b"\n") if ln.strip()]
+            if len(lines) > 1 or (lines and pos == 0):
+                return lines[-1].decode("utf-8")
+    return None
+
+
+def last_candle_t(path: str) -> Optional[int]:
+    if not os.path.exists(path):
+        return None
+    try:
+        ln = _last_line(path)
+        return int(json.loads(ln)["t"]) if ln else None
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        rows = read_candles(path)
+        return int(rows[-1]["t"]) if rows else None
+
+
+def candle_line(c: Dict[str, float]) -> str:
+    return json.dumps({k: c[k] for k in CANDLE_KEYS if k in c}) + "\n"
+
+
+class CandleHistory:
+    """
+    يضيف شموعاً مغلقة فقط إذا كانت أحدث من آخر شمعة محفوظة (بدون تكرار).
+    """
+
+    def __init__(self, data_root: str) -> None:
+        self.data_root = str(data_root)
+        self._last: Dict[str, Optional[int]] = {}
+
+    def last_t(self, symbol: str) -> Optional[int]:
+        if symbol not in self._last:
+            self._last[symbol] = last_candle_t(history_path(self.data_root, symbol))
+        return self._last[symbol]
+
+    def append(self, symbol: str, candles: Iterable[Dict[str, float]]) -> int:
+        last = self.last_t(symbol)
+        fresh = []
+        for c in sorted(candles, key=lambda x: x["t"]):
+            t = int(c["t"])
+            if last is None or t > last:
+                fresh.append(dict(c, t=t))
+                last = t
+        if not fresh:
+            return 0
+        append_text(history_path(self.data_root, symbol), "".join(candle_line(c) for c in fresh))
+        self._last[symbol] = last
+        return len(fresh)
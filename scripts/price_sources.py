@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+price_sources.py
+
+طبقة موحدة فوق مزوّدي الأسعار (Binance و CryptoCompare) مع hedged requests:
+
+- كل مزوّد يرجع نفس الشكل: [{"t": ms, "c": close}, ...] لشموع 1m.
+- توحيد الرموز: BTCUSDT <-> fsym=BTC&tsym=USD.
+- نتابع صحة كل مزوّد (latency / أخطاء متتالية).
+- الطلب يذهب للمزوّد الأساسي؛ لو لم يرد خلال p95 الخاص به نطلق الثاني
+  ونأخذ أول رد ناجح. لو فشل الأساسي بسرعة نطلق الثاني فوراً.
+
+الاستخدام:
+    PRICES.klines_1m("BTCUSDT", 120, prefer="binance")
+    PRICES.last_close("BTCUSDT", prefer="cryptocompare")
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from ratelimit import PRIORITY_HISTORY, urlopen_json
+
+BINANCE_BASE = os.getenv("BINANCE_BASE", "https://api.binance.com")
+CC_MINUTE_URL = os.getenv("CC_MINUTE_URL", "https://min-api.cryptocompare.com/data/v2/histominute")
+
+# عملات الربط التي تعاملها CryptoCompare كـ USD
+QUOTES = ("USDT", "USDC", "BUSD", "USD")
+CC_QUOTE = {"USDT": "USD", "USDC": "USD", "BUSD": "USD", "USD": "USD"}
+
+
+class PriceSourceError(RuntimeError):
+    pass
+
+
+def split_symbol(symbol: str) -> Tuple[str, str]:
+    """
+    'BTCUSDT' -> ('BTC', 'USDT')
+    """
+    s = symbol.strip().upper()
+    for q in QUOTES:
+        if s.endswith(q) and len(s) > len(q):
+            return s[: -len(q)], q
+    raise PriceSourceError(f"unknown quote asset in symbol {symbol!r}")
+
+
+def to_cc_pair(symbol: str) -> Tuple[str, str]:
+    """
+    'BTCUSDT' -> ('BTC', 'USD')  (fsym, tsym)
+    """
+    base, quote = split_symbol(symbol)
+    return base, CC_QUOTE[quote]
+
+
+def from_cc_pair(fsym: str, tsym: str = "USD") -> str:
+    """
+    ('BTC', 'USD') -> 'BTCUSDT'  (نفس تسمية ملفات data/)
+    """
+    quote = "USDT" if tsym.upper() == "USD" else tsym.upper()
+    return fsym.upper() + quote
+
+
+# ----------------- المزوّدون -----------------
+
+
+class PriceSource:
+    name = "base"
+
+    def klines_1m(self, symbol: str, limit: int, priority: int = PRIORITY_HISTORY) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def last_close(self, symbol: str, priority: int = PRIORITY_HISTORY) -> float:
+        rows = self.klines_1m(symbol, 2, priority)
+        return float(rows[-1]["c"])
+
+
+class BinanceSource(PriceSource):
+    name = "binance"
+
+    def __init__(self, base_url: str = BINANCE_BASE, timeout: float = 10) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def klines_1m(self, symbol: str, limit: int, priority: int = PRIORITY_HISTORY) -> List[Dict[str, Any]]:
+        qs = urlencode({"symbol": symbol.upper(), "interval": "1m", "limit": min(1000, int(limit))})
+        data = urlopen_json(f"{self.base_url}/api/v3/klines?{qs}", priority=priority, timeout=self.timeout)
+        if not isinstance(data, list) or not data:
+            raise PriceSourceError(f"binance: no klines for {symbol}")
+        return [{"t": int(k[0]), "c": float(k[4])} for k in data]
+
+
+class CryptoCompareSource(PriceSource):
+    name = "cryptocompare"
+
+    def __init__(self, url: str = CC_MINUTE_URL, timeout: float = 20) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    def klines_1m(self, symbol: str, limit: int, priority: int = PRIORITY_HISTORY) -> List[Dict[str, Any]]:
+        fsym, tsym = to_cc_pair(symbol)
+        # CryptoCompare يرجع limit+1 نقطة
+        qs = urlencode({"fsym": fsym, "tsym": tsym, "limit": max(1, int(limit) - 1), "aggregate": 1})
+        data = urlopen_json(f"{self.url}?{qs}", priority=priority, timeout=self.timeout)
+        rows = (data or {}).get("Data", {}).get("Data", []) if isinstance(data, dict) else []
+        out = []
+        for p in rows:
+            t = p.get("time")
+            c = p.get("close")
+            if t is None or c is None:
+                continue
+            out.append({"t": int(t) * 1000, "c": float(c)})
+        if not out:
+            raise PriceSourceError(f"cryptocompare: no rows for {symbol}")
+        return out
+
+
+# ----------------- الصحة + hedging -----------------
+
+
+class ProviderHealth:
+    __slots__ = ("latencies", "ok", "errors", "consecutive_errors", "down_until")
+
+    def __init__(self, window: int = 50) -> None:
+        self.latencies: deque = deque(maxlen=window)
+        self.ok = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.down_until = 0.0
+
+    def record(self, latency: float, ok: bool, now: float, cooldown: float) -> None:
+        if ok:
+            self.ok += 1
+            self.consecutive_errors = 0
+            self.latencies.append(latency)
+        else:
+            self.errors += 1
+            self.consecutive_errors += 1
+            if self.consecutive_errors >= 3:
+                # نؤجله عن دور الأساسي لفترة، لكنه يبقى احتياطياً
+                self.down_until = now + cooldown
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < 5:
+            return None
+        vals = sorted(self.latencies)
+        return vals[int(0.95 * (len(vals) - 1))]
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+
+class HedgedPrices:
+    def __init__(
+        self,
+        sources: Sequence[PriceSource],
+        default_delay: float = 0.5,
+        min_delay: float = 0.05,
+        max_delay: float = 2.0,
+        cooldown: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.sources = list(sources)
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.cooldown = cooldown
+        self.clock = clock
+        self.health: Dict[str, ProviderHealth] = {s.name: ProviderHealth() for s in self.sources}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(16, 4 * len(self.sources)), thread_name_prefix="prices")
+
+    def hedge_delay(self, name: str) -> float:
+        with self._lock:
+            p95 = self.health[name].p95()
+        if p95 is None:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, p95))
+
+    def ordered(self, prefer: Optional[str] = None) -> List[PriceSource]:
+        now = self.clock()
+        with self._lock:
+            def key(src: PriceSource):
+                h = self.health[src.name]
+                return (not h.healthy(now), src.name != prefer, self.sources.index(src))
+            return sorted(self.sources, key=key)
+
+    def _run(self, src: PriceSource, method: str, args: tuple) -> Any:
+        t0 = self.clock()
+        try:
+            result = getattr(src, method)(*args)
+        except Exception:
+            with self._lock:
+                self.health[src.name].record(self.clock() - t0, False, self.clock(), self.cooldown)
+            raise
+        with self._lock:
+            self.health[src.name].record(self.clock() - t0, True, self.clock(), self.cooldown)
+        return result
+
+    def call(self, method: str, *args, prefer: Optional[str] = None) -> Any:
+        """
+        يرجع أول نتيجة ناجحة. يرمي PriceSourceError لو فشل الجميع.
+        """
+        order = self.ordered(prefer)
+        running: Dict[Any, PriceSource] = {}
+        errors: List[str] = []
+        nxt = 0
+
+        def fire() -> PriceSource:
+            nonlocal nxt
+            src = order[nxt]
+            nxt += 1
+            running[self._pool.submit(self._run, src, method, args)] = src
+            return src
+
+        primary = fire()
+        while running:
+            timeout = self.hedge_delay(primary.name) if nxt < len(order) else None
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # الأساسي بطيء -> hedge
+                primary = fire()
+                continue
+            for fut in done:
+                src = running.pop(fut)
+                try:
+                    return fut.result()
+                except Exception as exc:  # noqa: BLE001
+                    errors.append(f"{src.name}: {exc}")
+            if not running and nxt < len(order):
+                primary = fire()
+        raise PriceSourceError("all price sources failed: " + "; ".join(errors))
+
+    def klines_1m(self, symbol: str, limit: int, priority: int = PRIORITY_HISTORY, prefer: Optional[str] = None):
+        return self.call("klines_1m", symbol, limit, priority, prefer=prefer)
+
+    def last_close(self, symbol: str, priority: int = PRIORITY_HISTORY, prefer: Optional[str] = None) -> float:
+        return self.call("last_close", symbol, priority, prefer=prefer)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {
+                    "ok": h.ok,
+                    "errors": h.errors,
+                    "p95": h.p95(),
+                    "healthy": h.healthy(self.clock()),
+                }
+                for name, h in self.health.items()
+            }
+
+
+# مزوّدات مشتركة لكل process
+PRICES = HedgedPrices([BinanceSource(), CryptoCompareSource()])
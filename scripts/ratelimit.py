@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+ratelimit.py
+
+Governor مشترك لمعدّل الطلبات بدل time.sleep الثابتة في السكربتات.
+
+- token bucket لكل host، حجمه من حدود الـ weight للـ endpoint
+  (Binance: 6000 weight / دقيقة، klines = 2).
+- يصحّح نفسه من هيدرات الرد: X-MBX-USED-WEIGHT-1M و Retry-After.
+- 429 / 418: يوقف الـ host حتى Retry-After (أو backoff أُسّي) ثم يعيد المحاولة.
+  الحد الأقل الذي نتعلّمه من 429 يرجع تدريجياً إلى HOST_LIMITS (CAPACITY_RECOVERY_SEC)
+  حتى لا تبقى process طويلة (stream) مخنوقة بعد رفض واحد.
+- الطلبات المنتظرة تُخدم حسب الأولوية:
+    live predict > evaluate > history > training
+
+الاستخدام:
+    resp = GOVERNOR.request(url, lambda: SESSION.get(url, params=p, timeout=10),
+                            weight=2, priority=PRIORITY_PREDICT)
+أو مع urllib:
+    data = urlopen_json(url, priority=PRIORITY_EVALUATE)
+"""
+
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import urllib.error
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+PRIORITY_PREDICT = 0
+PRIORITY_EVALUATE = 1
+PRIORITY_HISTORY = 2
+PRIORITY_TRAIN = 3
+
+# host -> (capacity, window_sec)
+HOST_LIMITS: Dict[str, Tuple[float, float]] = {
+    "api.binance.com": (float(os.getenv("BINANCE_WEIGHT_PER_MIN", "6000")), 60.0),
+    "min-api.cryptocompare.com": (20.0, 1.0),
+}
+DEFAULT_LIMIT = (10.0, 1.0)
+
+# وزن كل endpoint حسب توثيق Binance
+ENDPOINT_WEIGHTS = {
+    "/api/v3/klines": 2,
+    "/api/v3/ticker/price": 2,
+}
+
+USED_WEIGHT_HEADER = "X-MBX-USED-WEIGHT-1M"
+RETRYABLE_STATUS = (418, 429)
+MAX_WAIT_SLICE = 1.0
+# زمن رجوع الحد المتعلَّم من أقل قيمة إلى الحد المضبوط (خطياً)
+CAPACITY_RECOVERY_SEC = float(os.getenv("RATELIMIT_RECOVERY_SEC", "600"))
+
+
+def log(msg: str) -> None:
+    ts = time.strftime("[%Y-%m-%d %H:%M:%S]", time.gmtime())
+    print(f"{ts} [ratelimit] {msg}", flush=True)
+
+
+def endpoint_weight(url: str, default: int = 1) -> int:
+    return ENDPOINT_WEIGHTS.get(urlsplit(url).path, default)
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.netloc or parts.path
+
+
+class HostBucket:
+    __slots__ = (
+        "limit", "window", "capacity", "rate", "tokens", "updated", "blocked_until", "strikes", "waiters",
+    )
+
+    def __init__(self, capacity: float, window_sec: float, now: float) -> None:
+        # limit: الحد المضبوط؛ capacity: الحد الفعلي (قد يقل بعد 429 ثم يرجع)
+        self.limit = capacity
+        self.window = window_sec
+        self.capacity = capacity
+        self.rate = capacity / window_sec
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self.waiters: list = []
+
+    def refill(self, now: float) -> None:
+        if now > self.updated:
+            if self.capacity < self.limit:
+                step = (now - self.updated) * self.limit / CAPACITY_RECOVERY_SEC
+                self.capacity = min(self.limit, self.capacity + step)
+                self.rate = self.capacity / self.window
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+
+class Governor:
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.limits = dict(HOST_LIMITS if limits is None else limits)
+        self.clock = clock
+        self._buckets: Dict[str, HostBucket] = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+
+    def _bucket(self, host: str) -> HostBucket:
+        b = self._buckets.get(host)
+        if b is None:
+            cap, window = self.limits.get(host, DEFAULT_LIMIT)
+            b = HostBucket(cap, window, self.clock())
+            self._buckets[host] = b
+        return b
+
+    # ----------------- الحجز -----------------
+
+    def acquire(self, url: str, weight: float = 1, priority: int = PRIORITY_HISTORY) -> None:
+        """
+        ينتظر حتى يتوفر weight في bucket الـ host ويكون هذا الطلب أول
+        الطابور حسب الأولوية (ثم الأقدم).
+        """
+        host = _host_key(url)
+        with self._cond:
+            b = self._bucket(host)
+            weight = min(float(weight), b.capacity)
+            ticket = (priority, next(self._seq))
+            heapq.heappush(b.waiters, ticket)
+            try:
+                while True:
+                    now = self.clock()
+                    b.refill(now)
+                    if b.waiters[0] == ticket:
+                        if now < b.blocked_until:
+                            wait = b.blocked_until - now
+                        elif b.tokens >= weight:
+                            b.tokens -= weight
+                            return
+                        else:
+                            wait = (weight - b.tokens) / b.rate
+                    else:
+                        wait = MAX_WAIT_SLICE
+                    self._cond.wait(min(wait, MAX_WAIT_SLICE))
+            finally:
+                b.waiters.remove(ticket)
+                heapq.heapify(b.waiters)
+                self._cond.notify_all()
+
+    # ----------------- التعلّم من الردود -----------------
+
+    def observe(self, url: str, status: Optional[int], headers: Any) -> float:
+        """
+        يحدّث الـ bucket من هيدرات الرد. يرجع مدة الإيقاف (ثوانٍ) لو 429/418.
+        headers: أي object فيه .get (requests / urllib / dict).
+        """
+        host = _host_key(url)
+        used = _header(headers, USED_WEIGHT_HEADER)
+        retry_after = _header(headers, "Retry-After")
+        with self._cond:
+            b = self._bucket(host)
+            now = self.clock()
+            b.refill(now)
+            if used is not None:
+                try:
+                    # السيرفر هو المرجع: لا نسمح لأنفسنا بأكثر من المتبقي عنده
+                    b.tokens = min(b.tokens, max(0.0, b.capacity - float(used)))
+                except ValueError:
+                    pass
+            pause = 0.0
+            if status in RETRYABLE_STATUS:
+                if used is not None:
+                    # الحد الحقيقي أقل مما ظننا: نتعلّمه من الـ weight وقت الرفض
+                    try:
+                        learned = max(1.0, float(used) - 1.0)
+                        if learned < b.capacity:
+                            b.capacity = learned
+                            b.rate = learned / b.window
+                    except ValueError:
+                        pass
+                b.strikes += 1
+                try:
+                    pause = float(retry_after) if retry_after is not None else 0.0
+                except ValueError:
+                    pause = 0.0
+                if pause <= 0:
+                    pause = min(60.0, 2.0 ** b.strikes)
+                b.blocked_until = max(b.blocked_until, now + pause)
+                b.tokens = 0.0
+                log(f"{host}: HTTP {status}, backing off {pause:.1f}s")
+            elif status is not None and status < 400:
+                b.strikes = 0
+            self._cond.notify_all()
+        return pause
+
+    # ----------------- طلب كامل مع إعادة المحاولة -----------------
+
+    def request(
+        self,
+        url: str,
+        send: Callable[[], Any],
+        weight: Optional[float] = None,
+        priority: int = PRIORITY_HISTORY,
+        attempts: int = 4,
+    ) -> Any:
+        """
+        send(): يرسل الطلب ويرجع response فيه status_code/status و headers.
+        urllib.error.HTTPError تُعامل كرد عادي. يرجع آخر response.
+        """
+        if weight is None:
+            weight = endpoint_weight(url)
+        resp = None
+        for attempt in range(1, attempts + 1):
+            self.acquire(url, weight, priority)
+            try:
+                resp = send()
+            except urllib.error.HTTPError as e:
+                self.observe(url, e.code, e.headers)
+                if e.code not in RETRYABLE_STATUS or attempt == attempts:
+                    raise
+                continue
+            status = getattr(resp, "status_code", None) or getattr(resp, "status", None)
+            self.observe(url, status, getattr(resp, "headers", None))
+            if status not in RETRYABLE_STATUS:
+                return resp
+        return resp
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._cond:
+            now = self.clock()
+            out = {}
+            for host, b in self._buckets.items():
+                b.refill(now)
+                out[host] = {
+                    "tokens": round(b.tokens, 2),
+                    "capacity": b.capacity,
+                    "blocked_for": max(0.0, round(b.blocked_until - now, 2)),
+                    "queued": len(b.waiters),
+                }
+            return out
+
+
+def _header(headers: Any, name: str) -> Optional[str]:
+    if headers is None:
+        return None
+    try:
+        v = headers.get(name)
+        if v is None:
+            v = headers.get(name.lower())
+        return v
+    except AttributeError:
+        return None
+
+
+# Governor واحد لكل process (كل السكربتات تشاركه)
+GOVERNOR = Governor()
+
+
+def urlopen_json(
+    url: str,
+    priority: int = PRIORITY_HISTORY,
+    weight: Optional[float] = None,
+    timeout: float = 20,
+    governor: Optional[Governor] = None,
+) -> Any:
+    """
+    GET عبر urllib مع الـ governor. يرمي نفس استثناءات urllib / json.
+    """
+    import urllib.request  # lazy: يضيف ~20ms لبدء كل سكربت (http.client / email / ssl)
+
+    gov = governor or GOVERNOR
+    holder = {}
+
+    def send():
+        resp = urllib.request.urlopen(url, timeout=timeout)
+        with resp:
+            holder["body"] = resp.read()
+        return resp
+
+    gov.request(url, send, weight=weight, priority=priority)
+    return json.loads(holder["body"].decode("utf-8"))
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+records.py
+
+نوع موحّد لسجلات التوقع + codec واحد تستخدمه كل السكربتات
+(run_predict / evaluate / summarize) بدل dicts بأشكال مختلفة.
+
+- Prediction: كلاس بـ __slots__ (بدون __dict__ لكل صف).
+- الحقول المتكررة (src / dir / outcome) تُحفظ كنسخة واحدة مشتركة (interned).
+- encode_line / decode_line: نفس فورمات ملفات data/<SYM>/<H>m.jsonl
+  التي تقرأها الواجهة الأمامية. الكتابة عبر fileio (atomic + O_APPEND).
+- iter_jsonl: generator لنافذة زمنية (t >= t_min) من ملف مرتب حسب t؛ يبدأ
+  من offset يجده بـ binary search (seek_time) بدل قراءة التاريخ كاملاً.
+  مع fields يقرأ الحقول المطلوبة فقط (مثلاً outcome للملخص) بـ regex بدون
+  json.loads لكل سطر.
+"""
+
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from fileio import append_text, atomic_write
+
+# ----------------- القيم الثابتة (enum fields) -----------------
+
+PENDING = "Pending"
+CORRECT = "Correct"
+WRONG = "Wrong"
+NO_TRADE = "No-Trade"
+OUTCOMES = (PENDING, CORRECT, WRONG, NO_TRADE)
+DECIDED = (CORRECT, WRONG)
+
+UP = "Up"
+DOWN = "Down"
+DIRECTIONS = (UP, DOWN)
+
+SRC_AUTO = "auto"
+SOURCES = (SRC_AUTO, "manual")
+
+# جدول واحد: أي نص معروف يرجع لنفس الـ object، وغير المعروف يمر عبر sys.intern
+_INTERNED: Dict[str, str] = {s: sys.intern(s) for s in OUTCOMES + DIRECTIONS + SOURCES}
+
+
+def intern_value(v: Optional[str]) -> Optional[str]:
+    if v is None:
+        return None
+    s = _INTERNED.get(v)
+    if s is None:
+        s = sys.intern(str(v))
+        _INTERNED[s] = s
+    return s
+
+
+# ترتيب المفاتيح كما في ملفات data/ الحالية
+FIELDS = (
+    "id", "t", "src", "dir", "conf", "range",
+    "priceLo", "priceHi", "base", "horizon", "outcome",
+)
+_INTERNED_FIELDS = frozenset(("src", "dir", "outcome"))
+
+
+class Prediction:
+    """
+    سجل توقع واحد. أي مفاتيح إضافية غير معروفة تُحفظ في extra
+    حتى لا نخسر بيانات عند إعادة الكتابة.
+    """
+
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(
+        self,
+        id: Optional[str] = None,
+        t: Optional[int] = None,
+        src: Optional[str] = SRC_AUTO,
+        dir: Optional[str] = None,
+        conf: Optional[float] = None,
+        range: Optional[Sequence[float]] = None,
+        priceLo: Optional[float] = None,
+        priceHi: Optional[float] = None,
+        base: Optional[float] = None,
+        horizon: Optional[int] = None,
+        outcome: Optional[str] = PENDING,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.id = id
+        self.t = t
+        self.src = intern_value(src)
+        self.dir = intern_value(dir)
+        self.conf = conf
+        self.range = range
+        self.priceLo = priceLo
+        self.priceHi = priceHi
+        self.base = base
+        self.horizon = horizon
+        self.outcome = intern_value(outcome)
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Prediction":
+        rec = cls.__new__(cls)
+        for k in FIELDS:
+            v = d.get(k)
+            if k in _INTERNED_FIELDS:
+                v = intern_value(v)
+            setattr(rec, k, v)
+        extra = None
+        if len(d) > len(FIELDS) or any(k not in FIELDS for k in d):
+            extra = {k: v for k, v in d.items() if k not in FIELDS} or None
+        rec.extra = extra
+        return rec
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for k in FIELDS:
+            v = getattr(self, k)
+            if v is not None:
+                out[k] = v
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+    def is_pending(self) -> bool:
+        return self.outcome is PENDING or self.outcome == PENDING
+
+    def __repr__(self) -> str:
+        return f"Prediction({self.to_dict()!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Prediction):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+
+# ----------------- codec -----------------
+
+# encoder واحد لكل السكربتات (بدل sort_keys في مكان و ensure_ascii في مكان آخر)
+_ENCODER = json.JSONEncoder(ensure_ascii=False)
+_DECODE = json.JSONDecoder().decode
+
+
+def encode_line(rec: Any) -> str:
+    """
+    يحوّل Prediction (أو dict) إلى سطر JSONL واحد مع "\\n".
+    """
+    d = rec.to_dict() if isinstance(rec, Prediction) else rec
+    return _ENCODER.encode(d) + "\n"
+
+
+def decode_line(line: str) -> Optional[Prediction]:
+    """
+    يرجع Prediction أو None لو السطر فارغ أو تالف.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        d = _DECODE(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(d, dict):
+        return None
+    return Prediction.from_dict(d)
+
+
+def read_predictions(path: str) -> List[Prediction]:
+    rows: List[Prediction] = []
+    if not os.path.exists(path):
+        return rows
+    with open(path, "r", encoding="utf-8") as f:
+        for ln in f:
+            rec = decode_line(ln)
+            if rec is not None:
+                rows.append(rec)
+    return rows
+
+
+def write_predictions(path: str, rows: Iterable[Any]) -> None:
+    """
+    إعادة كتابة atomic؛ لتعديل الملف (read-modify-write) أحطها بـ fileio.locked(path).
+    """
+    atomic_write(path, "".join(encode_line(r) for r in rows))
+
+
+def append_prediction(path: str, rec: Any) -> None:
+    append_text(path, encode_line(rec))
+
+
+# ----------------- المسار السريع: حقول فقط -----------------
+
+# regex لكل حقل scalar؛ أسرع بكثير من json.loads للسطر كامل
+_NUM = r"(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)"
+_STR = r'"((?:[^"\\]|\\.)*)"'
+_FIELD_RE = {
+    "t": re.compile(r'"t":\s*' + _NUM),
+    "horizon": re.compile(r'"horizon":\s*' + _NUM),
+    "conf": re.compile(r'"conf":\s*' + _NUM),
+    "base": re.compile(r'"base":\s*' + _NUM),
+    "priceLo": re.compile(r'"priceLo":\s*' + _NUM),
+    "priceHi": re.compile(r'"priceHi":\s*' + _NUM),
+    "id": re.compile(r'"id":\s*' + _STR),
+    "src": re.compile(r'"src":\s*' + _STR),
+    "dir": re.compile(r'"dir":\s*' + _STR),
+    "outcome": re.compile(r'"outcome":\s*' + _STR),
+}
+_INT_FIELDS = frozenset(("t", "horizon"))
+_STR_FIELDS = frozenset(("id", "src", "dir", "outcome"))
+
+
+def _to_int(raw: str) -> int:
+    try:
+        return int(raw)
+    except ValueError:
+        return int(float(raw))
+
+
+def _unescape(raw: str) -> str:
+    if "\\" in raw:
+        raw = json.loads('"' + raw + '"')
+    return raw
+
+
+def _to_enum(raw: str) -> str:
+    return intern_value(_unescape(raw))
+
+
+def _field_parsers(fields: Sequence[str]):
+    parsers = []
+    for k in fields:
+        rx = _FIELD_RE.get(k)
+        if rx is None:
+            raise KeyError(f"no fast path for field {k!r}")
+        if k in _INTERNED_FIELDS:
+            conv = _to_enum
+        elif k in _STR_FIELDS:
+            conv = _unescape
+        elif k in _INT_FIELDS:
+            conv = _to_int
+        else:
+            conv = float
+        parsers.append((rx.search, conv))
+    return parsers
+
+
+# ----------------- القراءة المتدفقة لنافذة زمنية -----------------
+
+# الملفات تُكتب بالإضافة فقط بوقت التوقع، فهي مرتبة حسب t. تحت هذا الحجم
+# (بالبايت) نكمل بمسح خطي بدل تقسيم النطاق أكثر.
+SEEK_BLOCK = 4096
+
+_T_SEARCH = _FIELD_RE["t"].search
+
+
+def _line_t(raw: bytes) -> Optional[int]:
+    m = _T_SEARCH(raw.decode("utf-8", "replace"))
+    return _to_int(m.group(1)) if m is not None else None
+
+
+def seek_time(f, t_min: int) -> int:
+    """
+    f مفتوح بـ "rb" وأسطره مرتبة حسب t. يرجع offset بداية سطر بحيث كل
+    الأسطر قبله t < t_min (قد تتبقى أسطر قليلة أقدم بعده، ضمن SEEK_BLOCK).
+    الأسطر الفارغة أو التالفة (بدون t) تُتخطى أثناء البحث.
+    """
+    f.seek(0, os.SEEK_END)
+    lo, hi = 0, f.tell()
+    # lo: بداية سطر وكل ما قبله أقدم من t_min. أي سطر يبدأ عند hi أو بعده t >= t_min.
+    while hi - lo > SEEK_BLOCK:
+        mid = (lo + hi) // 2
+        # الرجوع بايت واحد ثم readline: لو mid بداية سطر لا نخسره
+        f.seek(mid - 1)
+        f.readline()
+        t = None
+        while t is None and f.tell() < hi:
+            raw = f.readline()
+            if not raw:
+                break
+            t = _line_t(raw)
+        if t is not None and t < t_min:
+            lo = f.tell()
+        else:
+            hi = mid
+    return lo
+
+
+def iter_jsonl(
+    path: str,
+    t_min: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+    t_max: Optional[int] = None,
+) -> Iterator[Any]:
+    """
+    يمر على أسطر path بدون تحميل الملف كاملاً:
+    - t_min: يبدأ من seek_time ويتجاهل ما قبله (الأسطر بدون t تُتجاهل أيضاً).
+    - t_max: يتوقف عند أول سطر t > t_max (الملف مرتب).
+    - fields: يرجع tuple بالحقول المطلوبة فقط عبر المسار السريع (الأسطر الناقصة
+      تُتجاهل)؛ بدونه يرجع Prediction لكل سطر صالح.
+    """
+    if not os.path.exists(path):
+        return
+    parsers = _field_parsers(fields) if fields else None
+    with open(path, "rb") as f:
+        if t_min is not None:
+            f.seek(seek_time(f, t_min))
+        # بعد أول سطر داخل النافذة لا حاجة لفحص t_min (الترتيب)
+        check_min = t_min is not None
+        for raw in f:
+            if check_min or t_max is not None:
+                t = _line_t(raw)
+                if t is None:
+                    continue
+                if check_min:
+                    if t < t_min:
+                        continue
+                    check_min = False
+                if t_max is not None and t > t_max:
+                    return
+            ln = raw.decode("utf-8")
+            if parsers is None:
+                rec = decode_line(ln)
+                if rec is not None:
+                    yield rec
+                continue
+            ms = [search(ln) for search, _ in parsers]
+            if None in ms:
+                continue
+            yield tuple(conv(m.group(1)) for m, (_, conv) in zip(ms, parsers))
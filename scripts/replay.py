@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+replay.py
+
+تشغيل الـ pipeline كاملاً (predict -> evaluate -> summarize) على ساعة افتراضية
+بأقصى سرعة يسمح بها المعالج، لقياس الأداء قبل الإنتاج.
+
+- بورصة محلية (fake_exchange) تقدّم شموع 1m مسجلة على نفس الساعة الافتراضية.
+  لو التسجيل أقصر من المدة المطلوبة نكرر عوائد الدقائق المسجلة (حتمياً).
+- نفس إيقاع الـ workflows: predict كل 15m، evaluate كل 10m، summarize كل ساعة.
+- seed ثابت لكسر التعادل في predict_simple: نفس المدخلات -> نفس الملفات (digest).
+- يطبع: slots/sec، الوقت لكل مرحلة، وأحجام الملفات النهائية.
+
+التشغيل:
+  python scripts/replay.py --days 14
+  python scripts/replay.py --days 28 --backend sqlite --horizons 15,60,240 --keep /tmp/replay
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import clock
+import evaluate
+import run_predict
+import settings
+import summarize
+from fake_exchange import FakeExchange
+from history import MINUTE_MS, candle_line, history_path, read_candles, timeframe_for_horizon
+from price_sources import BinanceSource, CryptoCompareSource, HedgedPrices
+from ratelimit import GOVERNOR
+from storage import open_store
+from universe import load_symbols
+
+STAGES = ("predict", "evaluate", "summarize")
+
+
+def log(msg: str) -> None:
+    print(f"[replay] {msg}", flush=True)
+
+
+# ----------------- السوق المسجل -----------------
+
+
+def extend_closes(closes: Sequence[float], n: int) -> List[float]:
+    """
+    n سعر إغلاق: المسجل كما هو ثم تكرار عوائده الدقيقية بالدور.
+    """
+    if n <= len(closes):
+        return list(closes[:n])
+    rets = [closes[i] / closes[i - 1] for i in range(1, len(closes)) if closes[i - 1] > 0]
+    out = list(closes)
+    p = out[-1]
+    k = 0
+    while len(out) < n:
+        p *= rets[k % len(rets)] if rets else 1.0
+        out.append(p)
+        k += 1
+    return out
+
+
+def build_market(src_root: str, dst_root: str, symbols: Sequence[str], start_ms: int, minutes: int) -> List[str]:
+    """
+    يكتب dst_root/<SYM>/raw_1m.jsonl من start_ms لمدة minutes دقيقة.
+    يرجع العملات التي لها تسجيل.
+    """
+    ready = []
+    for sym in symbols:
+        rows = read_candles(history_path(src_root, sym))
+        closes = [float(r["c"]) for r in rows if float(r["c"]) > 0]
+        if len(closes) < 2:
+            log(f"WARN no recorded candles for {sym}, skipping")
+            continue
+        closes = extend_closes(closes, minutes)
+        path = history_path(dst_root, sym)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("".join(candle_line({"t": start_ms + i * MINUTE_MS, "c": c}) for i, c in enumerate(closes)))
+        ready.append(sym)
+    return ready
+
+
+# ----------------- التقرير -----------------
+
+
+def file_report(data_root: str) -> Dict[str, List[int]]:
+    """
+    النوع (15m.jsonl / summary.json / predictions.db ...) -> [عدد الملفات، مجموع البايتات].
+    """
+    out: Dict[str, List[int]] = {}
+    for path in sorted(Path(data_root).rglob("*")):
+        if path.is_file():
+            entry = out.setdefault(path.name, [0, 0])
+            entry[0] += 1
+            entry[1] += path.stat().st_size
+    return out
+
+
+def digest(data_root: str) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    for path in sorted(Path(data_root).rglob("*")):
+        if path.is_file() and path.suffix in (".jsonl", ".json"):
+            h.update(str(path.relative_to(data_root)).encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+# ----------------- الحلقة -----------------
+
+
+def replay(
+    market_src: str,
+    workdir: str,
+    symbols: Sequence[str],
+    horizons: Sequence[int],
+    days: float,
+    backend: str = "jsonl",
+    seed: int = 1,
+    predict_every: int = 15,
+    evaluate_every: int = 10,
+    summarize_every: int = 60,
+    verbose: bool = False,
+) -> Dict[str, object]:
+    market_root = os.path.join(workdir, "market")
+    data_root = os.path.join(workdir, "data")
+    os.makedirs(data_root, exist_ok=True)
+
+    tick = math.gcd(math.gcd(predict_every, evaluate_every), summarize_every)
+    # تاريخ كافٍ قبل أول فتحة لأطول أفق (features على 60 bar)
+    warmup = max(max(60, h + 20, 60 * timeframe_for_horizon(h)) for h in horizons) + 60
+    sim_minutes = int(days * 1440)
+    tail = max(horizons) + 2 * tick
+
+    firsts = [int(r["t"]) for s in symbols for r in read_candles(history_path(market_src, s))[:1]]
+    day_ms = 1440 * MINUTE_MS
+    market_start = (min(firsts) // day_ms * day_ms) if firsts else 0
+    sim_start_min = market_start // MINUTE_MS + warmup
+    sim_start_min += -sim_start_min % tick
+
+    symbols = build_market(market_src, market_root, symbols, market_start, warmup + sim_minutes + tail + tick)
+    if not symbols:
+        raise SystemExit("[replay] no recorded candles to replay")
+
+    vclock = clock.VirtualClock(sim_start_min * 60)
+    times = {s: 0.0 for s in STAGES}
+    calls = {s: 0 for s in STAGES}
+    slots = 0
+    errors = 0
+    sink = None if verbose else io.StringIO()
+
+    os.environ["STORAGE_BACKEND"] = backend
+    os.environ.pop("STORAGE_DB", None)
+    run_predict.seed_rng(seed)
+
+    with FakeExchange(market_root, weight_limit=10 ** 9, clock=vclock.now_ms) as fx, clock.use_clock(vclock):
+        # البورصة محلية: لا حاجة لإبطاء الطلبات
+        GOVERNOR.limits[fx.base_url.split("//", 1)[1]] = (1e9, 1.0)
+        prices = HedgedPrices([BinanceSource(fx.base_url), CryptoCompareSource(fx.base_url + "/data/v2/histominute")])
+        saved = (run_predict.PRICES, evaluate.PRICES, run_predict.DATA_ROOT)
+        run_predict.PRICES = evaluate.PRICES = prices
+        run_predict.DATA_ROOT = Path(data_root)
+
+        wall0 = time.perf_counter()
+        try:
+            with open_store(data_root, backend) as store, contextlib.redirect_stdout(sink or sys.stdout):
+                for minute in range(sim_start_min, sim_start_min + sim_minutes, tick):
+                    # الـ cron يبدأ بعد بداية الدقيقة بقليل
+                    vclock.set(minute * 60 + 5)
+                    if minute % predict_every == 0:
+                        t0 = time.perf_counter()
+                        run_predict.predict_all(symbols, horizons, store)
+                        times["predict"] += time.perf_counter() - t0
+                        calls["predict"] += 1
+                        slots += 1
+                    if minute % evaluate_every == 0:
+                        t0 = time.perf_counter()
+                        for sym in symbols:
+                            for h in horizons:
+                                evaluate.evaluate_file(data_root, sym, h, store)
+                        times["evaluate"] += time.perf_counter() - t0
+                        calls["evaluate"] += 1
+                    if minute % summarize_every == 0:
+                        t0 = time.perf_counter()
+                        summarize.main(data_root, argv=[])
+                        times["summarize"] += time.perf_counter() - t0
+                        calls["summarize"] += 1
+                    if sink is not None:
+                        errors += sink.getvalue().count("ERROR")
+                        sink.seek(0)
+                        sink.truncate()
+        finally:
+            run_predict.PRICES, evaluate.PRICES, run_predict.DATA_ROOT = saved
+        wall = time.perf_counter() - wall0
+
+    return {
+        "symbols": symbols,
+        "wall": wall,
+        "sim_minutes": sim_minutes,
+        "slots": slots,
+        "times": times,
+        "calls": calls,
+        "requests": fx.requests,
+        "errors": errors,
+        "files": file_report(data_root),
+        "digest": digest(data_root),
+        "data_root": data_root,
+    }
+
+
+def print_report(res: Dict[str, object], horizons: Sequence[int], backend: str) -> None:
+    wall = res["wall"]
+    log(f"{res['sim_minutes'] / 1440:.1f} simulated days, {len(res['symbols'])} symbols, "
+        f"horizons={list(horizons)}, backend={backend}")
+    log(f"wall {wall:.2f}s -> {res['slots'] / wall:.1f} slots/sec, "
+        f"{res['sim_minutes'] * 60 / wall:,.0f}x real time, {res['requests']} exchange requests, {res['errors']} errors")
+    log(f"{'stage':<10} {'runs':>6} {'total s':>9} {'ms/run':>9} {'share':>6}")
+    for s in STAGES:
+        n, t = res["calls"][s], res["times"][s]
+        log(f"{s:<10} {n:>6} {t:>9.2f} {1000 * t / max(1, n):>9.2f} {100 * t / wall:>5.1f}%")
+    log("files:")
+    for name, (n, size) in sorted(res["files"].items()):
+        log(f"  {name:<16} x{n:<4} {size / 1024:>10.1f} KiB")
+    log(f"digest {res['digest']}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Replay predict -> evaluate -> summarize on a virtual clock")
+    ap.add_argument("--days", type=float, default=14)
+    ap.add_argument("--horizons", default="15,60", help="e.g. 15,60,240")
+    ap.add_argument("--market", default=settings.data_root(), help="root with <SYM>/raw_1m.jsonl recordings")
+    ap.add_argument("--backend", choices=("jsonl", "sqlite"), default="jsonl")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--predict-every", type=int, default=15, help="minutes")
+    ap.add_argument("--evaluate-every", type=int, default=10, help="minutes")
+    ap.add_argument("--summarize-every", type=int, default=60, help="minutes")
+    ap.add_argument("--keep", default=None, help="work directory to keep (default: temp dir, removed)")
+    ap.add_argument("--verbose", action="store_true", help="show the scripts' own output")
+    args = ap.parse_args()
+
+    horizons = run_predict.supported_horizons(run_predict.parse_horizons([args.horizons]))
+    workdir = args.keep or tempfile.mkdtemp(prefix="replay-")
+    if args.keep and os.path.exists(os.path.join(workdir, "data")):
+        shutil.rmtree(os.path.join(workdir, "data"))
+    try:
+        res = replay(
+            args.market, workdir, load_symbols(), horizons, args.days, args.backend, args.seed,
+            args.predict_every, args.evaluate_every, args.summarize_every, args.verbose,
+        )
+        print_report(res, horizons, args.backend)
+        if args.keep:
+            log(f"output kept in {res['data_root']}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+resample.py
+
+محرك resampling متعدد الأطر الزمنية فوق شموع 1m المخزنة (data/<SYM>/raw_1m.jsonl).
+
+- تجميع vectorized بـ numpy (segmented reductions عبر reduceat) إلى
+  5m / 15m / 1h / 4h / 1d.
+- Resampler: يحدّث الـ bars تدريجياً عند وصول شموع 1m جديدة
+  (يعيد حساب آخر bar مفتوح فقط + الجديد).
+- يكتب data/<SYM>/ohlc_<tf>.jsonl لتقرأها الواجهة بدل طلب البورصة
+  (دفعة واحدة من main، أو مع كل شمعة عبر BarWriter في stream_klines --bars).
+
+التشغيل:
+  python scripts/resample.py            # كل العملات وكل الأطر
+"""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+import settings
+from fileio import atomic_write
+from history import MINUTE_MS, history_path, read_candles, timeframe_minutes
+
+OUTPUT_TIMEFRAMES = ("5m", "15m", "1h", "4h", "1d")
+BAR_KEYS = ("t", "o", "h", "l", "c", "v")
+
+
+def candles_to_arrays(candles: Sequence[Dict[str, float]]) -> Dict[str, np.ndarray]:
+    """
+    list of dicts -> أعمدة numpy. o/h/l تساوي c لو غير موجودة، و v = 0.
+    """
+    n = len(candles)
+    t = np.fromiter((int(r["t"]) for r in candles), dtype=np.int64, count=n)
+    c = np.fromiter((float(r["c"]) for r in candles), dtype=np.float64, count=n)
+    o = np.fromiter((float(r.get("o", r["c"])) for r in candles), dtype=np.float64, count=n)
+    h = np.fromiter((float(r.get("h", r["c"])) for r in candles), dtype=np.float64, count=n)
+    lo = np.fromiter((float(r.get("l", r["c"])) for r in candles), dtype=np.float64, count=n)
+    v = np.fromiter((float(r.get("v", 0.0)) for r in candles), dtype=np.float64, count=n)
+    if n > 1 and np.any(np.diff(t) <= 0):
+        t, idx = np.unique(t, return_index=True)
+        o, h, lo, c, v = o[idx], h[idx], lo[idx], c[idx], v[idx]
+    return {"t": t, "o": o, "h": h, "l": lo, "c": c, "v": v}
+
+
+def resample_arrays(a: Dict[str, np.ndarray], minutes: int) -> Dict[str, np.ndarray]:
+    """
+    يجمع أعمدة 1m (مرتبة حسب t) إلى bars بطول minutes.
+    t لكل bar = بداية الفترة (UTC-aligned)، مثل Binance.
+    """
+    t = a["t"]
+    if minutes == 1 or len(t) == 0:
+        return {k: a[k].copy() for k in BAR_KEYS}
+    span = minutes * MINUTE_MS
+    bucket = t // span
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(t)] - 1
+    return {
+        "t": bucket[starts] * span,
+        "o": a["o"][starts],
+        "h": np.maximum.reduceat(a["h"], starts),
+        "l": np.minimum.reduceat(a["l"], starts),
+        "c": a["c"][ends],
+        "v": np.add.reduceat(a["v"], starts),
+    }
+
+
+def resample(candles: Sequence[Dict[str, float]], tf) -> List[Dict[str, float]]:
+    bars = resample_arrays(candles_to_arrays(candles), timeframe_minutes(tf))
+    return bars_to_rows(bars)
+
+
+def resample_closes(candles: Sequence[Dict[str, float]], tf) -> List[float]:
+    """
+    closes فقط (لـ build_features). آخر bar قد يكون مفتوحاً: close = آخر سعر.
+    """
+    if not candles:
+        return []
+    return resample_arrays(candles_to_arrays(candles), timeframe_minutes(tf))["c"].tolist()
+
+
+def bars_to_rows(bars: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    cols = [bars[k].tolist() for k in BAR_KEYS]
+    return [dict(zip(BAR_KEYS, vals)) for vals in zip(*cols)]
+
+
+class Resampler:
+    """
+    يحافظ على bars لعدة أطر من stream شموع 1m.
+    update() يعيد تجميع آخر bar (قد يكون ناقصاً) مع الشموع الجديدة فقط.
+    """
+
+    def __init__(self, timeframes: Iterable = OUTPUT_TIMEFRAMES, keep_1m: int = 1440 * 2) -> None:
+        self.timeframes = {str(tf): timeframe_minutes(tf) for tf in timeframes}
+        self.keep_1m = keep_1m
+        self.minute: Dict[str, np.ndarray] = {k: np.empty(0, dtype=np.int64 if k == "t" else np.float64) for k in BAR_KEYS}
+        self.bars: Dict[str, Dict[str, np.ndarray]] = {
+            tf: {k: self.minute[k].copy() for k in BAR_KEYS} for tf in self.timeframes
+        }
+
+    def update(self, candles: Sequence[Dict[str, float]]) -> int:
+        if not candles:
+            return 0
+        new = candles_to_arrays(candles)
+        last_t = self.minute["t"][-1] if len(self.minute["t"]) else None
+        if last_t is not None:
+            keep = new["t"] > last_t
+            new = {k: v[keep] for k, v in new.items()}
+        n = len(new["t"])
+        if n == 0:
+            return 0
+        first_new = int(new["t"][0])
+        self.minute = {k: np.concatenate([self.minute[k], new[k]]) for k in BAR_KEYS}
+
+        for tf, minutes in self.timeframes.items():
+            span = minutes * MINUTE_MS
+            start = first_new // span * span
+            old = self.bars[tf]
+            cut = int(np.searchsorted(old["t"], start, side="left"))
+            src_from = int(np.searchsorted(self.minute["t"], start, side="left"))
+            tail = resample_arrays({k: v[src_from:] for k, v in self.minute.items()}, minutes)
+            self.bars[tf] = {k: np.concatenate([old[k][:cut], tail[k]]) for k in BAR_KEYS}
+
+        # لا نحتاج إلا آخر keep_1m دقيقة كمصدر لإعادة تجميع الـ bar المفتوح
+        if len(self.minute["t"]) > self.keep_1m:
+            self.minute = {k: v[-self.keep_1m:] for k, v in self.minute.items()}
+        return n
+
+    def rows(self, tf, limit: Optional[int] = None) -> List[Dict[str, float]]:
+        bars = self.bars[str(tf)]
+        if limit is not None:
+            bars = {k: v[-limit:] for k, v in bars.items()}
+        return bars_to_rows(bars)
+
+    def closes(self, tf) -> List[float]:
+        return self.bars[str(tf)]["c"].tolist()
+
+
+# ----------------- ملفات الواجهة -----------------
+
+
+def bars_path(data_root: str, symbol: str, tf: str) -> str:
+    return os.path.join(str(data_root), symbol, f"ohlc_{tf}.jsonl")
+
+
+def write_bars(data_root: str, symbol: str, resampler: Resampler) -> None:
+    for tf in resampler.timeframes:
+        atomic_write(bars_path(data_root, symbol, tf), "".join(json.dumps(r) + "\n" for r in resampler.rows(tf)))
+
+
+def load_resampler(data_root: str, symbol: str, timeframes: Iterable = OUTPUT_TIMEFRAMES) -> Resampler:
+    rs = Resampler(timeframes)
+    rs.update(read_candles(history_path(data_root, symbol)))
+    return rs
+
+
+class BarWriter:
+    """
+    on_candle hook للـ stream (stream_klines --bars): يحدّث Resampler لكل عملة
+    مع كل شمعة 1m مغلقة ويعيد كتابة ملفات ohlc_<tf>.jsonl.
+    """
+
+    def __init__(self, data_root: str, timeframes: Iterable = OUTPUT_TIMEFRAMES) -> None:
+        self.data_root = str(data_root)
+        self.timeframes = tuple(timeframes)
+        self._rs: Dict[str, Resampler] = {}
+
+    def __call__(self, symbol: str, candle: Dict[str, float]) -> None:
+        rs = self._rs.get(symbol)
+        if rs is None:
+            # raw_1m يحتوي الشمعة أصلاً (الـ history يكتب قبل الـ hook)
+            rs = self._rs[symbol] = load_resampler(self.data_root, symbol, self.timeframes)
+        rs.update([candle])
+        write_bars(self.data_root, symbol, rs)
+
+
+def main() -> None:
+    data_root = settings.data_root()
+    for sym in sorted(os.listdir(data_root)):
+        if not os.path.exists(history_path(data_root, sym)):
+            continue
+        rs = load_resampler(data_root, sym)
+        write_bars(data_root, sym, rs)
+        sizes = ", ".join(f"{tf}={len(rs.bars[tf]['t'])}" for tf in rs.timeframes)
+        print(f"[resample] {sym}: {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,48 +3,55 @@
 """
 run_predict.py
 
-سكربت بسيط لتوليد توقع واحد لكل عملة ولكل أفق زمني (15m / 60m)
+سكربت بسيط لتوليد توقع واحد لكل عملة ولكل أفق زمني (افتراضياً 15m / 60m)
 ويكتب النتائج في ملفات jsonl تحت مجلد data/ بنفس الفورمات الذي
 تستخدمه الواجهة الأمامية.
 
-- يعتمد على أسعار 1m من Binance.
+- يعتمد على أسعار 1m من Binance (و CryptoCompare كاحتياط عبر price_sources).
 - لا يوقف السكربت بالكامل لو فشلت عملة معيّنة.
 """
 
 import os
 import sys
-import json
 import time
 import math
 import random
 from pathlib import Path
+from typing import Optional
 
-import requests
+import clock
+import settings
+from history import MINUTE_MS, history_path, read_candles, timeframe_for_horizon
+from records import Prediction, PENDING, SRC_AUTO
+from price_sources import PRICES
+from ratelimit import PRIORITY_PREDICT
+from storage import PredictionStore, open_store
+from universe import load_symbols, shard_label, shard_symbols
 
 # ----------------- إعداد عام -----------------
 
-SYMBOLS_DEFAULT = [
-    "BTCUSDT",
-    "ETHUSDT",
-    "XRPUSDT",
-    "BNBUSDT",
-    "SOLUSDT",
-    "DOGEUSDT",
-    "ADAUSDT",
-    "LTCUSDT",
-    "SHIBUSDT",
-    "PUMPUSDT",
-]
-
 # الآفاق الزمنية الافتراضية بالدقائق
 HORIZONS_DEFAULT = [15, 60]
 
-BINANCE_BASE = "https://api.binance.com"
+# أقل عدد عملات لاستخدام predict_batch (features.py بـ numpy)
+BATCH_MIN_DEFAULT = 100
+
+# أقل عدد bars لحساب الـ features (نفس الشرط في predict_for_symbol)
+MIN_BARS = 20
+# أقصى شموع 1m في طلب واحد للمزوّد
+FETCH_MAX = 1000
+# دقائق 1m المحفوظة محلياً في raw_1m.jsonl (fetch_history يكتب هذا العدد)
+HISTORY_MINUTES = int(os.getenv("HISTORY_MINUTES", "720"))
+
+# مسار البيانات: DATA_ROOT أو <repo>/data (settings.py)
+DATA_ROOT = Path(settings.data_root())
+
+# مولّد كسر التعادل في predict_simple؛ PREDICT_SEED (أو seed_rng) يجعله قابلاً للتكرار
+_rng = random.Random(os.getenv("PREDICT_SEED"))
 
-SESSION = requests.Session()
-SESSION.headers.update(
-    {"User-Agent": "crypto-dashboard-v2-predict/1.0 (+github-actions)"}
-)
+
+def seed_rng(seed) -> None:
+    _rng.seed(seed)
 
 
 def log(msg: str) -> None:
@@ -58,38 +65,43 @@ def log(msg: str) -> None:
 def parse_symbols():
     """
     - من متغيّر البيئة SYMBOLS = "BTCUSDT,ETHUSDT,..."
-    - أو من القائمة الافتراضية أعلاه.
+    - أو من config/universe.json (انظر universe.py).
     """
-    env = os.getenv("SYMBOLS")
-    if env:
-        return [s.strip().upper() for s in env.split(",") if s.strip()]
-    return SYMBOLS_DEFAULT[:]
+    return load_symbols()
 
 
-def parse_horizons():
+def parse_horizon(tok: str) -> Optional[int]:
+    """
+    "15" / "15m" / "4h" / "1d" -> دقائق. None لو غير صالح.
+    """
+    tok = tok.strip().lower()
+    mult = {"m": 1, "h": 60, "d": 1440}.get(tok[-1:], None)
+    num = tok[:-1] if mult else tok
+    if not num.isdigit() or int(num) <= 0:
+        return None
+    return int(num) * (mult or 1)
+
+
+def parse_horizons(argv=None):
     """
     الأفق الزمني يمكن تحديده عن طريق:
-    - متغير البيئة HORIZON_MINUTES أو HORIZON
-    - أو أول argument:  python scripts/run_predict.py 15
+    - متغير البيئة HORIZON_MINUTES أو HORIZON (قائمة: "15,60,240" أو "15,4h,1d")
+    - أو الـ arguments:  python scripts/run_predict.py 15 240  (مع --shard i/N اختيارياً)
     وإلا يستخدم HORIZONS_DEFAULT.
+    الآفاق الأطول من 60m تُحسب على bars مُعاد تجميعها (resample.py).
     """
-    env_h = os.getenv("HORIZON_MINUTES") or os.getenv("HORIZON")
-    arg_h = None
-    if len(sys.argv) > 1:
-        try:
-            arg_h = int(sys.argv[1])
-        except ValueError:
-            arg_h = None
-
-    h = None
-    if arg_h is not None:
-        h = arg_h
-    elif env_h and env_h.isdigit():
-        h = int(env_h)
+    env_h = os.getenv("HORIZON_MINUTES") or os.getenv("HORIZON") or ""
+    argv = sys.argv[1:] if argv is None else argv
+    toks = [t for a in argv for t in a.split(",")]
+    hs = [parse_horizon(t) for t in toks if t.strip()]
+    if not any(hs):
+        hs = [parse_horizon(t) for t in env_h.split(",") if t.strip()]
 
-    if h:
-        return [h]
-    return HORIZONS_DEFAULT[:]
+    out = []
+    for h in hs:
+        if h and h not in out:
+            out.append(h)
+    return out or HORIZONS_DEFAULT[:]
 
 
 # ----------------- دوال مساعدة للـ indicators -----------------
@@ -135,7 +147,8 @@ def rsi14(closes):
 
 def build_features(closes):
     """
-    يبني مجموعة صغيرة من الـ features من آخر ~60 دقيقة.
+    يبني مجموعة صغيرة من الـ features من آخر ~60 bar
+    (دقائق 1m، أو bars أعلى من load_closes للآفاق الطويلة).
     """
     window = closes[-60:] if len(closes) >= 60 else closes[:]
     ema5 = ema(window, 5)
@@ -195,7 +208,7 @@ def predict_simple(feat):
 
     # كسر التعادل الخفيف لو p قريب من 0.5
     if abs(p_up - 0.5) < 1e-3:
-        p_up += (random.random() - 0.5) * 0.02
+        p_up += (_rng.random() - 0.5) * 0.02
 
     direction = "Up" if p_up >= 0.5 else "Down"
     conf = max(0.55, min(0.95, max(p_up, 1.0 - p_up)))
@@ -224,21 +237,11 @@ def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
 
-def read_last_record(path: Path):
-    if not path.exists():
-        return None
+def read_last_record(store: PredictionStore, symbol: str, horizon_min: int):
     try:
-        last_line = None
-        with path.open("r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    last_line = line
-        if not last_line:
-            return None
-        return json.loads(last_line)
+        return store.last(symbol, horizon_min)
     except Exception as exc:  # noqa: BLE001
-        log(f"warn: could not read last record from {path}: {exc}")
+        log(f"warn: could not read last record for {symbol} {horizon_min}m: {exc}")
         return None
 
 
@@ -251,10 +254,8 @@ def same_slot(t1_ms: int, t2_ms: int, horizon_min: int) -> bool:
     return slot1 == slot2
 
 
-def write_record(path: Path, obj: dict) -> None:
-    ensure_dir(path.parent)
-    with path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, sort_keys=True) + "\n")
+def write_record(store: PredictionStore, symbol: str, horizon_min: int, rec: Prediction) -> None:
+    store.append(symbol, horizon_min, rec)
 
 
 # ----------------- جلب بيانات 1m من Binance -----------------
@@ -262,41 +263,119 @@ def write_record(path: Path, obj: dict) -> None:
 
 def fetch_klines_1m(symbol: str, limit: int = 120):
     """
-    يجلب kline 1m من Binance:
-    - لو فشل يرمي استثناء (سيتم التعامل معه في مستوى أعلى).
+    يجلب kline 1m من Binance (مع CryptoCompare كـ hedge عبر price_sources):
+    - الإيقاع عبر الـ governor المشترك (أعلى أولوية).
+    - لو فشل كل المزوّدين يرمي استثناء (سيتم التعامل معه في مستوى أعلى).
+    """
+    return PRICES.klines_1m(symbol, limit, PRIORITY_PREDICT, prefer="binance")
+
+
+def load_closes(symbol: str, horizon_min: int):
+    """
+    closes على الإطار المناسب للأفق:
+    - حتى 60m: 1m مباشرة من المزوّد (كما كان).
+    - أطول: شموع 1m المخزنة في data/<SYM>/raw_1m.jsonl + الناقص فقط من
+      المزوّد، ثم resample إلى timeframe_for_horizon(h) (60 bar تقريباً).
+    """
+    tf = timeframe_for_horizon(horizon_min)
+    if tf == 1:
+        # نحتاج على الأقل ~60 دقيقة سابقة لعمل المميزات
+        candles = fetch_klines_1m(symbol, limit=max(60, horizon_min + 20))
+        return [c["c"] for c in candles]
+
+    from resample import resample_closes
+
+    need = 60 * tf
+    local = read_candles(history_path(DATA_ROOT, symbol))[-need:]
+    missing = need
+    if local:
+        missing = (clock.now_ms() - int(local[-1]["t"])) // MINUTE_MS + 1
+        if missing > FETCH_MAX:
+            # التاريخ المحلي قديم: لا يمكن سد الفجوة بطلب واحد، فلا نجمّع عبرها
+            log(f"{symbol}: local 1m history is {missing} minutes old, ignoring it")
+            local = []
+    fresh = fetch_klines_1m(symbol, limit=int(min(FETCH_MAX, max(2, missing))))
+    last_t = int(local[-1]["t"]) if local else None
+    fresh = [c for c in fresh if last_t is None or int(c["t"]) > last_t]
+    candles = contiguous_tail((local + fresh)[-need:], tf)
+    closes = resample_closes(candles, tf)
+    if len(closes) < MIN_BARS:
+        raise RuntimeError(
+            f"{symbol} {horizon_min}m needs {MIN_BARS} bars of {tf}m "
+            f"({MIN_BARS * tf} minutes of 1m history), only {len(closes)} available"
+        )
+    return closes
+
+
+def contiguous_tail(candles, tf: int):
+    """
+    آخر جزء متصل من شموع 1m: فجوة بحجم bar كامل أو أكثر تعني bars ناقصة،
+    فنأخذ ما بعدها فقط بدل التجميع عبرها بصمت.
+    """
+    gap = tf * MINUTE_MS
+    for i in range(len(candles) - 1, 0, -1):
+        if int(candles[i]["t"]) - int(candles[i - 1]["t"]) > gap:
+            return candles[i:]
+    return candles
+
+
+def horizon_supported(horizon_min: int) -> bool:
+    """
+    هل يكفي التاريخ المتاح (المحلي أو طلب واحد للمزوّد) لـ MIN_BARS bars من إطار الأفق؟
+    """
+    tf = timeframe_for_horizon(horizon_min)
+    return tf == 1 or MIN_BARS * tf <= max(HISTORY_MINUTES, FETCH_MAX)
+
+
+def supported_horizons(horizons):
+    """
+    يستبعد (مع ERROR في الـ log) الآفاق التي لا يغطيها التاريخ.
     """
-    url = f"{BINANCE_BASE}/api/v3/klines"
-    params = {"symbol": symbol, "interval": "1m", "limit": limit}
-    resp = SESSION.get(url, params=params, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-    return [{"t": int(k[0]), "c": float(k[4])} for k in data]
+    out = []
+    for h in horizons:
+        if horizon_supported(h):
+            out.append(h)
+            continue
+        tf = timeframe_for_horizon(h)
+        log(
+            f"ERROR: horizon {h}m needs {MIN_BARS * tf} minutes of 1m history for {tf}m bars; "
+            f"HISTORY_MINUTES={HISTORY_MINUTES}. Skipping it (raise HISTORY_MINUTES to enable)"
+        )
+    return out
 
 
 # ----------------- منطق التوقع لكل عملة -----------------
 
 
-def predict_for_symbol(symbol: str, horizon_min: int) -> None:
+def predict_for_symbol(
+    symbol: str,
+    horizon_min: int,
+    store: Optional[PredictionStore] = None,
+    closes=None,
+    feat=None,
+) -> None:
+    """
+    closes / feat اختيارية: predict_batch يمررها بعد حسابها لكل العملات مرة واحدة.
+    """
+    if store is None:
+        with open_store(DATA_ROOT) as own_store:
+            return predict_for_symbol(symbol, horizon_min, own_store, closes, feat)
     try:
-        # نحتاج على الأقل ~60 دقيقة سابقة لعمل المميزات
-        limit = max(60, horizon_min + 20)
-        candles = fetch_klines_1m(symbol, limit=limit)
-        if len(candles) < 20:
-            raise RuntimeError(f"too few klines for {symbol}: {len(candles)}")
+        if closes is None:
+            closes = load_closes(symbol, horizon_min)
+        if len(closes) < 20:
+            raise RuntimeError(f"too few klines for {symbol}: {len(closes)}")
 
-        closes = [c["c"] for c in candles]
         base_price = closes[-1]
-        feat = build_features(closes)
+        if feat is None:
+            feat = build_features(closes)
 
         pred = predict_simple(feat)
-        now_ms = int(time.time() * 1000)
-
-        data_dir = Path("data") / symbol
-        out_path = data_dir / f"{horizon_min}m.jsonl"
+        now_ms = clock.now_ms()
 
         # لا نكرّر التوقع داخل نفس الفتحة الزمنية
-        last_rec = read_last_record(out_path)
-        if last_rec and "t" in last_rec and same_slot(last_rec["t"], now_ms, horizon_min):
+        last_rec = read_last_record(store, symbol, horizon_min)
+        if last_rec and last_rec.t is not None and same_slot(last_rec.t, now_ms, horizon_min):
             log(f"{symbol} {horizon_min}m: already have prediction for this slot, skipping")
             return
 
@@ -311,21 +390,21 @@ def predict_for_symbol(symbol: str, horizon_min: int) -> None:
             price_lo = base_price * (1.0 - hi_pct / 100.0)
             price_hi = base_price * (1.0 + lo_pct / 100.0)
 
-        record = {
-            "id": f"{symbol}-{now_ms}-{horizon_min}",
-            "t": now_ms,
-            "src": "auto",
-            "dir": direction,
-            "conf": conf,
-            "range": [lo_pct, hi_pct],
-            "priceLo": price_lo,
-            "priceHi": price_hi,
-            "base": base_price,
-            "horizon": horizon_min,
-            "outcome": "Pending",
-        }
-
-        write_record(out_path, record)
+        record = Prediction(
+            id=f"{symbol}-{now_ms}-{horizon_min}",
+            t=now_ms,
+            src=SRC_AUTO,
+            dir=direction,
+            conf=conf,
+            range=[lo_pct, hi_pct],
+            priceLo=price_lo,
+            priceHi=price_hi,
+            base=base_price,
+            horizon=horizon_min,
+            outcome=PENDING,
+        )
+
+        write_record(store, symbol, horizon_min, record)
         log(
             f"{symbol} {horizon_min}m: wrote prediction "
             f"dir={direction} conf={conf:.2f} "
@@ -337,16 +416,73 @@ def predict_for_symbol(symbol: str, horizon_min: int) -> None:
         log(f"ERROR: prediction failed for {symbol} {horizon_min}m: {exc}")
 
 
+def predict_batch(symbols, horizon_min: int, store: PredictionStore) -> None:
+    """
+    نفس predict_for_symbol لكن الـ features لكل العملات دفعة واحدة بـ numpy (features.py).
+    الجلب والكتابة يبقيان لكل عملة، وفشل عملة لا يوقف الباقي.
+    """
+    from features import batch_features, close_matrix, feature_rows
+
+    loaded = []
+    for sym in symbols:
+        try:
+            loaded.append((sym, load_closes(sym, horizon_min)))
+        except Exception as exc:  # noqa: BLE001
+            log(f"ERROR: prediction failed for {sym} {horizon_min}m: {exc}")
+    if not loaded:
+        return
+    feats = feature_rows(batch_features(*close_matrix([c for _, c in loaded])))
+    for (sym, closes), feat in zip(loaded, feats):
+        predict_for_symbol(sym, horizon_min, store, closes, feat)
+
+
+def batch_enabled(n_symbols: int) -> bool:
+    """
+    المسار الـ batch أسرع من حوالي 100 عملة، لكن import numpy البارد (~100ms) أغلى
+    من الفرق؛ لذلك افتراضياً يُستخدم فقط لو numpy محمّل أصلاً في الـ process،
+    أو لو PREDICT_BATCH_MIN محدد صراحةً (0 = معطّل).
+    """
+    env = os.getenv("PREDICT_BATCH_MIN")
+    threshold = int(env) if env else BATCH_MIN_DEFAULT
+    if threshold <= 0 or n_symbols < threshold:
+        return False
+    if not env and "numpy" not in sys.modules:
+        return False
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        log("numpy not installed, computing features per symbol")
+        return False
+    return True
+
+
+def predict_all(symbols, horizons, store: PredictionStore) -> None:
+    if batch_enabled(len(symbols)):
+        for h in horizons:
+            predict_batch(symbols, h, store)
+        return
+    for sym in symbols:
+        for h in horizons:
+            predict_for_symbol(sym, h, store)
+
+
 # ----------------- main -----------------
 
 
 def main():
-    symbols = parse_symbols()
-    horizons = parse_horizons()
-    log(f"starting predict for symbols={symbols} horizons={horizons}")
-    for sym in symbols:
+    symbols, shard, rest = shard_symbols()
+    # --dry-run: يحل الإعدادات ويطبع الخطة فقط (بدون شبكة أو كتابة)؛ يقيس زمن البدء
+    dry_run = "--dry-run" in rest
+    horizons = supported_horizons(parse_horizons([a for a in rest if a != "--dry-run"]))
+    log(f"starting predict for symbols={symbols} horizons={horizons} shard={shard_label(shard)}")
+    if dry_run:
+        backend = os.getenv("STORAGE_BACKEND") or "jsonl"
         for h in horizons:
-            predict_for_symbol(sym, h)
+            log(f"dry-run: {len(symbols)} symbols x {h}m on {timeframe_for_horizon(h)}m bars -> {backend} in {DATA_ROOT}")
+        return
+    ensure_dir(DATA_ROOT)
+    with open_store(DATA_ROOT) as store:
+        predict_all(symbols, horizons, store)
     log("predict done")
 
 
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+serve.py
+
+خادم HTTP اختياري (asyncio فقط، بدون مكتبات خارجية) فوق ملفات data/.
+
+- يحمّل التوقعات والملخصات في فهارس بالذاكرة مفتاحها (symbol, horizon, t).
+- يعيد تحميل الملفات التي تغيّرت فقط (حسب mtime/size) كل بضع ثوانٍ.
+- كل صف له رقم seq يزيد عند إضافته أو تغيّر الـ outcome، حتى يطلب
+  العميل الفروقات فقط:  ?after=<seq>&epoch=<X-Epoch>
+  الـ seq خاص بكل process؛ X-Epoch يتغير مع كل تشغيل للخادم، ولو أرسل العميل
+  epoch قديماً نتجاهل after ونرجع السلسلة كاملة (والعميل يعيد البناء من الصفر).
+- ETag قوي لكل رد + If-None-Match -> 304 + gzip.
+
+المسارات:
+  GET /api/health
+  GET /api/symbols
+  GET /api/predictions/<SYMBOL>/<H>?since=<ms>&after=<seq>&epoch=<e>&limit=<n>&latest=<n>
+  GET /api/summary
+  GET /api/summary/<SYMBOL>
+
+التشغيل:
+  python scripts/serve.py --port 8787
+ثم افتح index.html?api=http://127.0.0.1:8787
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import settings
+from records import encode_line, read_predictions
+
+SERIES_RE = re.compile(r"^(\d+)m\.jsonl$")
+GZIP_MIN_BYTES = 512
+MAX_HEADER_BYTES = 16 * 1024
+
+
+def log(msg: str) -> None:
+    ts = time.strftime("[%Y-%m-%d %H:%M:%S]", time.gmtime())
+    print(f"{ts} [serve] {msg}", flush=True)
+
+
+# ----------------- الفهارس في الذاكرة -----------------
+
+
+class Series:
+    """
+    توقعات عملة واحدة لأفق واحد، مرتبة حسب t.
+    lines: الأسطر المشفّرة جاهزة للإرسال (bytes) حتى لا نعيد التشفير لكل طلب.
+    """
+
+    __slots__ = ("ts", "ids", "lines", "seqs", "sig")
+
+    def __init__(self) -> None:
+        self.ts: List[int] = []
+        self.ids: List[str] = []
+        self.lines: List[bytes] = []
+        self.seqs: List[int] = []
+        self.sig: Optional[Tuple[int, int]] = None
+
+
+class DataIndex:
+    def __init__(self, data_root: str) -> None:
+        self.data_root = data_root
+        # seq يبدأ من 0 في كل process؛ epoch يميّز التشغيلات عن بعضها
+        self.epoch = os.urandom(6).hex()
+        self.seq = 0
+        self.series: Dict[Tuple[str, int], Series] = {}
+        # path -> (sig, raw bytes)
+        self.docs: Dict[str, Tuple[Tuple[int, int], bytes]] = {}
+
+    # --- تحميل ---
+
+    @staticmethod
+    def _sig(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self) -> int:
+        """
+        يعيد قراءة الملفات التي تغيّرت فقط. يرجع عدد الصفوف الجديدة/المعدّلة.
+        """
+        changed = 0
+        if not os.path.isdir(self.data_root):
+            return 0
+        seen = set()
+        for sym in sorted(os.listdir(self.data_root)):
+            sym_dir = os.path.join(self.data_root, sym)
+            if not os.path.isdir(sym_dir) or sym == "models":
+                continue
+            for name in os.listdir(sym_dir):
+                m = SERIES_RE.match(name)
+                if not m:
+                    continue
+                key = (sym, int(m.group(1)))
+                seen.add(key)
+                changed += self._load_series(key, os.path.join(sym_dir, name))
+        for key in list(self.series):
+            if key not in seen:
+                del self.series[key]
+        return changed
+
+    def _load_series(self, key: Tuple[str, int], path: str) -> int:
+        sig = self._sig(path)
+        old = self.series.get(key)
+        if old is not None and old.sig == sig:
+            return 0
+
+        prev: Dict[str, Tuple[bytes, int]] = {}
+        if old is not None:
+            prev = {i: (ln, s) for i, ln, s in zip(old.ids, old.lines, old.seqs)}
+
+        rows = [r for r in read_predictions(path) if r.t is not None]
+        rows.sort(key=lambda r: r.t)
+
+        new = Series()
+        new.sig = sig
+        changed = 0
+        for r in rows:
+            line = encode_line(r).encode("utf-8")
+            rid = r.id or f"{r.t}-{key[1]}"
+            before = prev.get(rid)
+            if before is not None and before[0] == line:
+                s = before[1]
+            else:
+                self.seq += 1
+                s = self.seq
+                changed += 1
+            new.ts.append(int(r.t))
+            new.ids.append(rid)
+            new.lines.append(line)
+            new.seqs.append(s)
+        self.series[key] = new
+        return changed
+
+    def doc(self, rel: str) -> Optional[bytes]:
+        path = os.path.join(self.data_root, rel)
+        sig = self._sig(path)
+        if sig is None:
+            return None
+        cached = self.docs.get(path)
+        if cached is not None and cached[0] == sig:
+            return cached[1]
+        with open(path, "rb") as f:
+            raw = f.read()
+        self.docs[path] = (sig, raw)
+        return raw
+
+    # --- استعلامات ---
+
+    def query(
+        self,
+        symbol: str,
+        horizon: int,
+        since: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+        latest: Optional[int] = None,
+    ) -> Optional[bytes]:
+        s = self.series.get((symbol, horizon))
+        if s is None:
+            return None
+        lo = bisect_left(s.ts, since) if since is not None else 0
+        idx = range(lo, len(s.ts))
+        if after is not None:
+            idx = [i for i in idx if s.seqs[i] > after]
+        if latest is not None:
+            idx = idx[-latest:] if latest > 0 else []
+        if limit is not None:
+            idx = idx[:limit]
+        return b"".join(s.lines[i] for i in idx)
+
+    def symbols(self) -> Dict[str, List[int]]:
+        out: Dict[str, List[int]] = {}
+        for sym, h in sorted(self.series):
+            out.setdefault(sym, []).append(h)
+        return out
+
+
+# ----------------- HTTP -----------------
+
+STATUS_TEXT = {
+    200: "OK",
+    204: "No Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    431: "Request Header Fields Too Large",
+}
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, HEAD, OPTIONS",
+    "Access-Control-Allow-Headers": "If-None-Match",
+    "Access-Control-Expose-Headers": "ETag, X-Seq, X-Epoch",
+}
+
+
+def make_etag(body: bytes, gz: bool, salt: str = "") -> str:
+    h = hashlib.blake2b(body, digest_size=12, key=salt.encode("ascii")).hexdigest()
+    # الـ ETag القوي يجب أن يختلف بين النسخة المضغوطة وغير المضغوطة
+    return f'"{h}-gz"' if gz else f'"{h}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip() == etag for tag in header.split(","))
+
+
+def _int_param(qs: Dict[str, List[str]], name: str, minimum: Optional[int] = None) -> Optional[int]:
+    vals = qs.get(name)
+    if not vals:
+        return None
+    v = int(vals[0])
+    if minimum is not None and v < minimum:
+        raise ValueError(f"{name} must be >= {minimum}")
+    return v
+
+
+class ApiServer:
+    def __init__(self, index: DataIndex, reload_sec: float = 5.0) -> None:
+        self.index = index
+        self.reload_sec = reload_sec
+        self._last_refresh = 0.0
+
+    def maybe_refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._last_refresh >= self.reload_sec:
+            self._last_refresh = now
+            n = self.index.refresh()
+            if n:
+                log(f"reloaded {n} changed rows (seq={self.index.seq})")
+
+    def route(self, path: str, qs: Dict[str, List[str]]) -> Tuple[int, str, bytes, Dict[str, str]]:
+        parts = [unquote(p) for p in path.strip("/").split("/") if p]
+        if not parts or parts[0] != "api":
+            return 404, "application/json", b'{"error": "not found"}', {}
+        parts = parts[1:]
+        seq_hdr = {"X-Seq": str(self.index.seq), "X-Epoch": self.index.epoch}
+
+        if parts == ["health"]:
+            body = json.dumps(
+                {"ok": True, "epoch": self.index.epoch, "seq": self.index.seq, "series": len(self.index.series)}
+            )
+            return 200, "application/json", body.encode(), seq_hdr
+
+        if parts == ["symbols"]:
+            return 200, "application/json", json.dumps(self.index.symbols()).encode(), seq_hdr
+
+        if len(parts) == 3 and parts[0] == "predictions":
+            sym = parts[1].upper()
+            try:
+                after = _int_param(qs, "after")
+                # seq من تشغيل سابق للخادم لا معنى له هنا: نرجع كل الصفوف
+                if qs.get("epoch", [self.index.epoch])[0] != self.index.epoch:
+                    after = None
+                horizon = int(parts[2].rstrip("m"))
+                body = self.index.query(
+                    sym,
+                    horizon,
+                    since=_int_param(qs, "since"),
+                    after=after,
+                    limit=_int_param(qs, "limit", minimum=0),
+                    latest=_int_param(qs, "latest", minimum=0),
+                )
+            except ValueError:
+                return 400, "application/json", b'{"error": "bad parameter"}', {}
+            if body is None:
+                return 404, "application/json", b'{"error": "unknown series"}', {}
+            return 200, "application/x-ndjson; charset=utf-8", body, seq_hdr
+
+        if parts == ["summary"] or (len(parts) == 2 and parts[0] == "summary"):
+            if len(parts) == 1:
+                rel = "summary.json"
+            else:
+                # فقط عملات معروفة: المقطع بعد unquote قد يحمل ".." أو "/" فيخرج من data_root
+                sym = parts[1].upper()
+                if sym not in self.index.symbols():
+                    return 404, "application/json", b'{"error": "unknown symbol"}', {}
+                rel = os.path.join(sym, "summary.json")
+            body = self.index.doc(rel)
+            if body is None:
+                return 404, "application/json", b'{"error": "no summary"}', {}
+            return 200, "application/json; charset=utf-8", body, {}
+
+        return 404, "application/json", b'{"error": "not found"}', {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 431, "text/plain", b"", {}, False)
+                    break
+                if len(head) > MAX_HEADER_BYTES:
+                    await self._send(writer, 431, "text/plain", b"", {}, False)
+                    break
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._send(writer, 400, "text/plain", b"", {}, False)
+                    break
+                headers = {}
+                for ln in lines[1:]:
+                    if ":" in ln:
+                        k, v = ln.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                if method == "OPTIONS":
+                    await self._send(writer, 204, "text/plain", b"", {}, keep_alive)
+                elif method not in ("GET", "HEAD"):
+                    await self._send(writer, 405, "text/plain", b"", {"Allow": "GET, HEAD, OPTIONS"}, keep_alive)
+                else:
+                    self.maybe_refresh()
+                    url = urlsplit(target)
+                    status, ctype, body, extra = self.route(url.path, parse_qs(url.query))
+                    gz = (
+                        status == 200
+                        and len(body) >= GZIP_MIN_BYTES
+                        and "gzip" in headers.get("accept-encoding", "")
+                    )
+                    if status == 200:
+                        # ردود الـ seq تختلف بين تشغيلات الخادم حتى لو تطابق المحتوى
+                        etag = make_etag(body, gz, extra.get("X-Epoch", ""))
+                        extra = dict(extra, ETag=etag, Vary="Accept-Encoding")
+                        extra["Cache-Control"] = "no-cache"
+                        if etag_matches(headers.get("if-none-match"), etag):
+                            status, body, gz = 304, b"", False
+                        elif gz:
+                            body = gzip.compress(body, compresslevel=6, mtime=0)
+                            extra["Content-Encoding"] = "gzip"
+                    await self._send(writer, status, ctype, body, extra, keep_alive, head_only=(method == "HEAD"))
+
+                if not keep_alive:
+                    break
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        ctype: str,
+        body: bytes,
+        extra: Dict[str, str],
+        keep_alive: bool,
+        head_only: bool = False,
+    ) -> None:
+        hdrs = {
+            "Content-Type": ctype,
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+        }
+        hdrs.update(CORS_HEADERS)
+        hdrs.update(extra)
+        if status == 304:
+            hdrs.pop("Content-Length", None)
+        out = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        out.extend(f"{k}: {v}" for k, v in hdrs.items())
+        writer.write(("\r\n".join(out) + "\r\n\r\n").encode("latin-1"))
+        if body and not head_only:
+            writer.write(body)
+        await writer.drain()
+
+
+async def serve(host: str, port: int, data_root: str, reload_sec: float) -> None:
+    index = DataIndex(data_root)
+    n = index.refresh()
+    api = ApiServer(index, reload_sec)
+    api._last_refresh = time.monotonic()
+    server = await asyncio.start_server(api.handle, host, port, limit=MAX_HEADER_BYTES * 2)
+    log(f"loaded {n} rows from {data_root}; listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Local query API over data/ predictions and summaries")
+    ap.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8787")))
+    ap.add_argument("--data", default=settings.data_root())
+    ap.add_argument("--reload", type=float, default=5.0, help="seconds between file change checks")
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.data, args.reload))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+settings.py
+
+loader إعدادات واحد لكل الأوامر (python -m scripts ...).
+
+السكربتات تقرأ إعداداتها من متغيرات البيئة (SYMBOLS / HORIZON_MINUTES / STORAGE_BACKEND ...).
+هنا نجمعها من ثلاث طبقات بالأولوية:
+  1) flags سطر الأوامر (--data / --symbols / --horizons / --backend / --shard)
+  2) متغيرات البيئة الموجودة
+  3) ملف config/pipeline.json (اختياري، أو --config FILE)، مثلاً:
+       {"horizons": [15, 60, 240], "backend": "sqlite", "seed": 7}
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FILE = os.path.join(ROOT, "config", "pipeline.json")
+
+# مفتاح الإعداد -> متغير البيئة الذي تقرأه السكربتات
+ENV_KEYS = {
+    "data": "DATA_ROOT",
+    "symbols": "SYMBOLS",
+    "universe": "UNIVERSE_FILE",
+    "horizons": "HORIZON_MINUTES",
+    "train_horizons": "TRAIN_HORIZONS",
+    "train_days": "TRAIN_DAYS",
+    "history_minutes": "HISTORY_MINUTES",
+    "backend": "STORAGE_BACKEND",
+    "db": "STORAGE_DB",
+    "shard": "SHARD",
+    "seed": "PREDICT_SEED",
+    "binance_base": "BINANCE_BASE",
+}
+
+
+def data_root() -> str:
+    """
+    مجلد data/ المشترك (DATA_ROOT أو <repo>/data).
+    """
+    return os.getenv("DATA_ROOT") or os.path.join(ROOT, "data")
+
+
+def _as_env(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(v) for v in value)
+    return str(value)
+
+
+def load_config(path: Optional[str] = None) -> Dict[str, Any]:
+    path = path or os.getenv("PIPELINE_CONFIG") or CONFIG_FILE
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    unknown = sorted(set(doc) - set(ENV_KEYS))
+    if unknown:
+        raise ValueError(f"{path}: unknown settings {unknown} (known: {sorted(ENV_KEYS)})")
+    return doc
+
+
+def apply(file_cfg: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, str]:
+    """
+    يكتب الإعدادات في os.environ: الملف لا يغطي البيئة، والـ flags تغطي الاثنين.
+    يرجع الإعدادات الفعلية (بأسماء متغيرات البيئة).
+    """
+    for key, value in file_cfg.items():
+        if value is not None:
+            os.environ.setdefault(ENV_KEYS[key], _as_env(value))
+    for key, value in overrides.items():
+        if value is not None:
+            os.environ[ENV_KEYS[key]] = _as_env(value)
+    return {env: os.environ[env] for env in ENV_KEYS.values() if env in os.environ}
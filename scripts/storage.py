@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+storage.py
+
+طبقة تخزين قابلة للتبديل لسجلات التوقع.
+
+- JsonlStore (الافتراضي): نفس ملفات data/<SYM>/<H>m.jsonl كما هي.
+- SqliteStore: قاعدة SQLite (WAL) فيها جدول predictions مفهرس على
+  (symbol, horizon, t) وعلى outcome، فالإضافة والتحديث والتجميع
+  تتم بدون إعادة كتابة ملفات كاملة.
+
+الاختيار عبر متغيّر البيئة:
+  STORAGE_BACKEND=jsonl|sqlite   (الافتراضي jsonl)
+  STORAGE_DB=data/predictions.db (مسار قاعدة SQLite)
+
+أوامر مساعدة:
+  python scripts/storage.py import   # JSONL -> SQLite (مرة واحدة)
+  python scripts/storage.py export   # SQLite -> JSONL + summary.json للواجهة
+"""
+
+import json
+import os
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import settings
+from fileio import locked
+from records import (
+    CORRECT,
+    DECIDED,
+    PENDING,
+    Prediction,
+    append_prediction,
+    decode_line,
+    intern_value,
+    iter_jsonl,
+    read_predictions,
+    write_predictions,
+)
+
+SERIES_RE = re.compile(r"^(\d+)m\.jsonl$")
+DEFAULT_DB_NAME = "predictions.db"
+
+
+class PredictionStore:
+    """
+    الواجهة المشتركة. كل الدوال تعمل على (symbol, horizon).
+    """
+
+    name = "base"
+
+    def last(self, symbol: str, horizon: int) -> Optional[Prediction]:
+        raise NotImplementedError
+
+    def append(self, symbol: str, horizon: int, rec: Prediction) -> None:
+        raise NotImplementedError
+
+    def due_pending(
+        self, symbol: str, horizon: int, t_max: int, t_min: Optional[int] = None
+    ) -> List[Prediction]:
+        """
+        توقعات Pending لها t <= t_max (أي مرّ عليها وقت كافٍ للتقييم)،
+        و t >= t_min لو محدد (نافذة البحث بدل كل التاريخ).
+        """
+        raise NotImplementedError
+
+    def set_outcomes(self, symbol: str, horizon: int, updates: Dict[str, str]) -> int:
+        """
+        updates: id -> outcome. يرجع عدد الصفوف التي تغيّرت.
+        """
+        raise NotImplementedError
+
+    def hit_counts(self, symbol: str, horizon: int, t_min: int) -> Tuple[int, int]:
+        """
+        (correct, total) للتوقعات المحسومة (Correct/Wrong) ذات t >= t_min.
+        """
+        raise NotImplementedError
+
+    def all(self, symbol: str, horizon: int) -> List[Prediction]:
+        raise NotImplementedError
+
+    def series(self) -> List[Tuple[str, int]]:
+        raise NotImplementedError
+
+    def horizons(self, symbol: str, default: Sequence[int] = ()) -> List[int]:
+        """
+        كل الآفاق التي لها توقعات محفوظة لهذه العملة + default، مرتبة.
+        evaluate / summarize تمر عليها بدل قائمة ثابتة.
+        """
+        found = {h for s, h in self.series() if s == symbol}
+        return sorted(found.union(default))
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "PredictionStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ----------------- JSONL (الافتراضي) -----------------
+
+
+class JsonlStore(PredictionStore):
+    name = "jsonl"
+
+    def __init__(self, data_root: str) -> None:
+        self.data_root = str(data_root)
+
+    def path(self, symbol: str, horizon: int) -> str:
+        return os.path.join(self.data_root, symbol, f"{horizon}m.jsonl")
+
+    def last(self, symbol: str, horizon: int) -> Optional[Prediction]:
+        path = self.path(symbol, horizon)
+        if not os.path.exists(path):
+            return None
+        last_line = None
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    last_line = line
+        return decode_line(last_line) if last_line else None
+
+    def append(self, symbol: str, horizon: int, rec: Prediction) -> None:
+        append_prediction(self.path(symbol, horizon), rec)
+
+    def due_pending(
+        self, symbol: str, horizon: int, t_max: int, t_min: Optional[int] = None
+    ) -> List[Prediction]:
+        return [
+            r for r in iter_jsonl(self.path(symbol, horizon), t_min=t_min, t_max=t_max)
+            if r.is_pending()
+        ]
+
+    def set_outcomes(self, symbol: str, horizon: int, updates: Dict[str, str]) -> int:
+        if not updates:
+            return 0
+        path = self.path(symbol, horizon)
+        # قفل حصري: append من predict ينتظر حتى تنتهي إعادة الكتابة فلا يضيع
+        with locked(path):
+            rows = read_predictions(path)
+            changed = 0
+            for r in rows:
+                new = updates.get(r.id)
+                if new is not None and r.outcome != new:
+                    r.outcome = intern_value(new)
+                    changed += 1
+            if changed:
+                write_predictions(path, rows)
+        return changed
+
+    def hit_counts(self, symbol: str, horizon: int, t_min: int) -> Tuple[int, int]:
+        total = correct = 0
+        for (outcome,) in iter_jsonl(self.path(symbol, horizon), t_min=t_min, fields=("outcome",)):
+            if outcome not in DECIDED:
+                continue
+            total += 1
+            if outcome is CORRECT:
+                correct += 1
+        return correct, total
+
+    def all(self, symbol: str, horizon: int) -> List[Prediction]:
+        return read_predictions(self.path(symbol, horizon))
+
+    def series(self) -> List[Tuple[str, int]]:
+        out = []
+        if not os.path.isdir(self.data_root):
+            return out
+        for sym in sorted(os.listdir(self.data_root)):
+            sym_dir = os.path.join(self.data_root, sym)
+            if not os.path.isdir(sym_dir):
+                continue
+            for name in sorted(os.listdir(sym_dir)):
+                m = SERIES_RE.match(name)
+                if m:
+                    out.append((sym, int(m.group(1))))
+        return out
+
+    def horizons(self, symbol: str, default: Sequence[int] = ()) -> List[int]:
+        # مجلد العملة فقط بدل series() على كل data/
+        found = set(default)
+        sym_dir = os.path.join(self.data_root, symbol)
+        if os.path.isdir(sym_dir):
+            for name in os.listdir(sym_dir):
+                m = SERIES_RE.match(name)
+                if m:
+                    found.add(int(m.group(1)))
+        return sorted(found)
+
+
+# ----------------- SQLite -----------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    pk       INTEGER PRIMARY KEY,
+    symbol   TEXT    NOT NULL,
+    horizon  INTEGER NOT NULL,
+    id       TEXT    NOT NULL,
+    t        INTEGER NOT NULL,
+    src      TEXT,
+    dir      TEXT,
+    conf     REAL,
+    lo_pct   REAL,
+    hi_pct   REAL,
+    price_lo REAL,
+    price_hi REAL,
+    base     REAL,
+    outcome  TEXT,
+    extra    TEXT,
+    UNIQUE (symbol, horizon, id)
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_sht ON predictions (symbol, horizon, t);
+CREATE INDEX IF NOT EXISTS idx_predictions_outcome ON predictions (outcome, symbol, horizon, t);
+"""
+
+_COLS = "id, t, src, dir, conf, lo_pct, hi_pct, price_lo, price_hi, base, horizon, outcome, extra"
+
+
+def _row_to_prediction(row: Sequence) -> Prediction:
+    (rid, t, src, d, conf, lo, hi, plo, phi, base, horizon, outcome, extra) = row
+    rng = [lo, hi] if lo is not None or hi is not None else None
+    return Prediction(
+        id=rid, t=t, src=src, dir=d, conf=conf, range=rng,
+        priceLo=plo, priceHi=phi, base=base, horizon=horizon, outcome=outcome,
+        extra=json.loads(extra) if extra else None,
+    )
+
+
+def _prediction_params(symbol: str, horizon: int, rec: Prediction) -> tuple:
+    rng = rec.range or [None, None]
+    rid = rec.id or f"{symbol}-{rec.t}-{horizon}"
+    extra = json.dumps(rec.extra, ensure_ascii=False) if rec.extra else None
+    return (
+        symbol, horizon, rid, int(rec.t), rec.src, rec.dir, rec.conf,
+        rng[0], rng[1] if len(rng) > 1 else None,
+        rec.priceLo, rec.priceHi, rec.base, rec.outcome, extra,
+    )
+
+
+class SqliteStore(PredictionStore):
+    name = "sqlite"
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = str(db_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        import sqlite3  # lazy: الـ backend الافتراضي jsonl لا يحتاجه
+
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def last(self, symbol: str, horizon: int) -> Optional[Prediction]:
+        row = self.conn.execute(
+            f"SELECT {_COLS} FROM predictions WHERE symbol = ? AND horizon = ? "
+            "ORDER BY t DESC, pk DESC LIMIT 1",
+            (symbol, horizon),
+        ).fetchone()
+        return _row_to_prediction(row) if row else None
+
+    def append(self, symbol: str, horizon: int, rec: Prediction) -> None:
+        self.append_many(symbol, horizon, [rec])
+
+    def append_many(self, symbol: str, horizon: int, recs: Iterable[Prediction]) -> int:
+        """
+        صف بنفس (symbol, horizon, id) موجود مسبقاً لا يُستبدل (import ثانٍ من JSONL قديم
+        لا يمسح نتائج evaluate)؛ فقط Pending يأخذ outcome محسوماً من المصدر.
+        """
+        params = [_prediction_params(symbol, horizon, r) + (PENDING, PENDING) for r in recs if r.t is not None]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO predictions "
+                "(symbol, horizon, id, t, src, dir, conf, lo_pct, hi_pct, "
+                " price_lo, price_hi, base, outcome, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (symbol, horizon, id) DO UPDATE SET outcome = excluded.outcome "
+                "WHERE predictions.outcome IS ? AND excluded.outcome IS NOT ?",
+                params,
+            )
+        return len(params)
+
+    def due_pending(
+        self, symbol: str, horizon: int, t_max: int, t_min: Optional[int] = None
+    ) -> List[Prediction]:
+        rows = self.conn.execute(
+            f"SELECT {_COLS} FROM predictions "
+            "WHERE outcome = ? AND symbol = ? AND horizon = ? AND t <= ? AND t >= ? ORDER BY t",
+            (PENDING, symbol, horizon, t_max, -(2 ** 63) if t_min is None else t_min),
+        ).fetchall()
+        return [_row_to_prediction(r) for r in rows]
+
+    def set_outcomes(self, symbol: str, horizon: int, updates: Dict[str, str]) -> int:
+        if not updates:
+            return 0
+        with self.conn:
+            cur = self.conn.executemany(
+                "UPDATE predictions SET outcome = ? "
+                "WHERE symbol = ? AND horizon = ? AND id = ? AND outcome IS NOT ?",
+                [(o, symbol, horizon, rid, o) for rid, o in updates.items()],
+            )
+        return cur.rowcount
+
+    def hit_counts(self, symbol: str, horizon: int, t_min: int) -> Tuple[int, int]:
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(outcome = ?), 0), COUNT(*) FROM predictions "
+            "WHERE outcome IN (?, ?) AND symbol = ? AND horizon = ? AND t >= ?",
+            (CORRECT,) + DECIDED + (symbol, horizon, t_min),
+        ).fetchone()
+        return int(row[0]), int(row[1])
+
+    def all(self, symbol: str, horizon: int) -> List[Prediction]:
+        rows = self.conn.execute(
+            f"SELECT {_COLS} FROM predictions WHERE symbol = ? AND horizon = ? ORDER BY t, pk",
+            (symbol, horizon),
+        ).fetchall()
+        return [_row_to_prediction(r) for r in rows]
+
+    def series(self) -> List[Tuple[str, int]]:
+        rows = self.conn.execute(
+            "SELECT DISTINCT symbol, horizon FROM predictions ORDER BY symbol, horizon"
+        ).fetchall()
+        return [(s, int(h)) for s, h in rows]
+
+    def horizons(self, symbol: str, default: Sequence[int] = ()) -> List[int]:
+        rows = self.conn.execute(
+            "SELECT DISTINCT horizon FROM predictions WHERE symbol = ?", (symbol,)
+        ).fetchall()
+        return sorted({int(h) for (h,) in rows}.union(default))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# ----------------- الاختيار + import/export -----------------
+
+
+def default_db_path(data_root: str) -> str:
+    return os.getenv("STORAGE_DB") or os.path.join(str(data_root), DEFAULT_DB_NAME)
+
+
+def open_store(data_root: str, backend: Optional[str] = None) -> PredictionStore:
+    backend = (backend or os.getenv("STORAGE_BACKEND") or "jsonl").strip().lower()
+    if backend == "jsonl":
+        return JsonlStore(data_root)
+    if backend == "sqlite":
+        return SqliteStore(default_db_path(data_root))
+    raise ValueError(f"unknown STORAGE_BACKEND: {backend!r} (expected jsonl or sqlite)")
+
+
+def import_jsonl(src: PredictionStore, dst: SqliteStore) -> int:
+    n = 0
+    for sym, h in src.series():
+        n += dst.append_many(sym, h, src.all(sym, h))
+    return n
+
+
+def export_static(store: PredictionStore, data_root: str) -> int:
+    """
+    يعيد توليد ملفات JSONL و summary.json التي تقرأها الواجهة الثابتة.
+    """
+    import summarize
+
+    n = 0
+    for sym, h in store.series():
+        rows = store.all(sym, h)
+        path = os.path.join(str(data_root), sym, f"{h}m.jsonl")
+        with locked(path):
+            write_predictions(path, rows)
+        n += len(rows)
+    summarize.write_summaries(store, str(data_root))
+    return n
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Prediction storage import/export")
+    ap.add_argument("command", choices=("import", "export"))
+    ap.add_argument("--data", default=settings.data_root())
+    ap.add_argument("--db", default=None, help="SQLite path (default: $STORAGE_DB or data/predictions.db)")
+    args = ap.parse_args(argv)
+
+    db = SqliteStore(args.db or default_db_path(args.data))
+    try:
+        if args.command == "import":
+            n = import_jsonl(JsonlStore(args.data), db)
+            print(f"[storage] imported {n} rows into {db.db_path}")
+        else:
+            n = export_static(db, args.data)
+            print(f"[storage] exported {n} rows from {db.db_path} to {args.data}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+stream_klines.py
+
+Ingester بالـ WebSocket بدل polling الـ REST لشموع 1m:
+
+- يشترك في combined stream لكل العملات: <sym>@kline_1m
+- كل شمعة مغلقة (k.x == true) تُضاف إلى data/<SYM>/raw_1m.jsonl
+- يعيد الاتصال تلقائياً (backoff)، وبعد كل إعادة اتصال يملأ الفجوة عبر REST.
+  اتصال صامت أطول من STREAM_IDLE_TIMEOUT (بدون رسائل ولا ping) يُعامل كمقطوع.
+- on_candle: hook اختياري يُستدعى عند إغلاق كل شمعة (مثلاً لتشغيل التوقع فوراً).
+
+التشغيل:
+  python scripts/stream_klines.py                      # Binance
+  python scripts/stream_klines.py --predict            # + توقع عند إغلاق فتحة 15m/60m
+  python scripts/stream_klines.py --bars               # + تحديث ohlc_<tf>.jsonl (resample.py)
+  python scripts/fake_exchange.py --replay-speed 0.5 &
+  python scripts/stream_klines.py --ws-url ws://127.0.0.1:9900 --rest-url http://127.0.0.1:9900
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import settings
+import wsproto
+from history import MINUTE_MS, CandleHistory
+from price_sources import BinanceSource, PriceSourceError
+from ratelimit import PRIORITY_PREDICT
+
+BINANCE_WS = os.getenv("BINANCE_WS", "wss://stream.binance.com:9443")
+MAX_BACKFILL = 1000
+# Binance يرسل ping كل ~3 دقائق وتحديث kline كل ثانيتين؛ الصمت الأطول = اتصال ميت
+IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT", "600"))
+
+
+def log(msg: str) -> None:
+    ts = time.strftime("[%Y-%m-%d %H:%M:%S]", time.gmtime())
+    print(f"{ts} [stream] {msg}", flush=True)
+
+
+def stream_url(ws_base: str, symbols: Sequence[str]) -> str:
+    streams = "/".join(f"{s.lower()}@kline_1m" for s in symbols)
+    return f"{ws_base.rstrip('/')}/stream?streams={streams}"
+
+
+def parse_kline_event(msg: Any) -> Optional[Dict[str, Any]]:
+    """
+    يحوّل رسالة combined stream إلى شمعة مغلقة {symbol, t, o, h, l, c, v}
+    أو None لو الشمعة لم تُغلق بعد.
+    """
+    if isinstance(msg, (str, bytes)):
+        msg = json.loads(msg)
+    data = msg.get("data", msg)
+    k = data.get("k") if isinstance(data, dict) else None
+    if not k or not k.get("x"):
+        return None
+    return {
+        "symbol": str(data.get("s") or k.get("s")).upper(),
+        "t": int(k["t"]),
+        "o": float(k["o"]),
+        "h": float(k["h"]),
+        "l": float(k["l"]),
+        "c": float(k["c"]),
+        "v": float(k.get("v", 0.0)),
+    }
+
+
+class KlineIngester:
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        history: CandleHistory,
+        ws_base: str = BINANCE_WS,
+        rest: Optional[Callable[[str, int], List[Dict[str, Any]]]] = None,
+        on_candle: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        max_backoff: float = 30.0,
+        clock: Callable[[], float] = time.time,
+        idle_timeout: Optional[float] = IDLE_TIMEOUT,
+    ) -> None:
+        self.symbols = [s.upper() for s in symbols]
+        self.history = history
+        self.ws_base = ws_base
+        self.rest = rest or (lambda sym, n: BinanceSource().klines_1m(sym, n, PRIORITY_PREDICT))
+        self.on_candle = on_candle
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.idle_timeout = idle_timeout
+        self.connects = 0
+        self.received = 0
+        self.backfilled = 0
+        self.skipped = 0
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _store(self, symbol: str, candles: List[Dict[str, Any]]) -> int:
+        n = self.history.append(symbol, candles)
+        if n and self.on_candle:
+            for c in candles[-n:]:
+                try:
+                    self.on_candle(symbol, c)
+                except Exception as exc:  # noqa: BLE001
+                    log(f"WARN on_candle failed for {symbol}: {exc}")
+        return n
+
+    async def backfill(self) -> int:
+        """
+        يملأ الفجوة منذ آخر شمعة محفوظة لكل عملة عبر REST.
+        آخر kline في رد REST ما زالت مفتوحة فنستبعدها.
+        """
+        loop = asyncio.get_running_loop()
+        total = 0
+        now_ms = int(self.clock() * 1000)
+        for sym in self.symbols:
+            last = self.history.last_t(sym)
+            if last is None:
+                continue
+            missing = (now_ms - last) // MINUTE_MS
+            if missing < 1:
+                continue
+            limit = int(min(MAX_BACKFILL, missing + 1))
+            try:
+                while True:
+                    rows = await loop.run_in_executor(None, self.rest, sym, limit)
+                    # REST يرجع آخر limit شمعة: لو أُغلقت دقائق أثناء الطلب (انتظار الـ governor)
+                    # لا تصل النافذة لآخر شمعة محفوظة -> نعيد بحد أكبر بدل ترك فجوة
+                    if not rows or int(rows[0]["t"]) <= last + MINUTE_MS or limit >= MAX_BACKFILL:
+                        break
+                    limit = min(MAX_BACKFILL, limit * 2)
+            except (PriceSourceError, OSError, ValueError) as exc:
+                log(f"WARN backfill failed for {sym}: {exc}")
+                continue
+            closed = [r for r in rows[:-1] if int(r["t"]) > last]
+            n = self._store(sym, closed)
+            if n:
+                log(f"{sym}: backfilled {n} candles")
+            total += n
+        self.backfilled += total
+        return total
+
+    async def _session(self) -> None:
+        ws = await wsproto.connect(stream_url(self.ws_base, self.symbols), idle_timeout=self.idle_timeout)
+        self.connects += 1
+        log(f"connected ({len(self.symbols)} streams, connect #{self.connects})")
+        try:
+            # الرسائل التي تصل أثناء الـ backfill تبقى في الـ buffer
+            await self.backfill()
+            while not self._stop.is_set():
+                recv = asyncio.ensure_future(ws.recv())
+                stop = asyncio.ensure_future(self._stop.wait())
+                done, _ = await asyncio.wait({recv, stop}, return_when=asyncio.FIRST_COMPLETED)
+                if recv not in done:
+                    recv.cancel()
+                    break
+                stop.cancel()
+                try:
+                    candle = parse_kline_event(recv.result())
+                except (ValueError, KeyError, TypeError, AttributeError) as exc:
+                    # رسالة تالفة (JSON / UTF-8 / حقول ناقصة): نتجاهلها ولا نقطع الاتصال
+                    self.skipped += 1
+                    log(f"WARN skipping undecodable message: {exc!r}")
+                    continue
+                if candle is None:
+                    continue
+                self.received += 1
+                sym = candle.pop("symbol")
+                self._store(sym, [candle])
+        finally:
+            await ws.close()
+
+    async def run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                await self._session()
+                backoff = 1.0
+            except (wsproto.ConnectionClosed, OSError, asyncio.TimeoutError) as exc:
+                if self._stop.is_set():
+                    break
+                delay = backoff * (0.5 + random.random())
+                log(f"disconnected ({exc}); reconnecting in {delay:.1f}s")
+                try:
+                    await asyncio.wait_for(self._stop.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                backoff = min(self.max_backoff, backoff * 2)
+
+
+def slot_closer(horizons: Sequence[int], fire: Callable[[str, int], None]):
+    """
+    on_candle يستدعي fire(symbol, horizon) عندما تغلق الشمعة فتحة horizon كاملة.
+    """
+    def on_candle(symbol: str, candle: Dict[str, Any]) -> None:
+        close_t = int(candle["t"]) + MINUTE_MS
+        for h in horizons:
+            if close_t % (h * MINUTE_MS) == 0:
+                fire(symbol, h)
+    return on_candle
+
+
+def main() -> None:
+    from run_predict import HORIZONS_DEFAULT, parse_symbols, predict_for_symbol
+
+    ap = argparse.ArgumentParser(description="Stream closed 1m klines into data/<SYM>/raw_1m.jsonl")
+    ap.add_argument("--data", default=settings.data_root())
+    ap.add_argument("--ws-url", default=BINANCE_WS)
+    ap.add_argument("--rest-url", default=None, help="REST base for gap backfill (default: BINANCE_BASE)")
+    ap.add_argument("--predict", action="store_true", help="run predictions when a 15m/60m slot closes")
+    ap.add_argument("--bars", action="store_true", help="keep data/<SYM>/ohlc_<tf>.jsonl resampled bars up to date")
+    args = ap.parse_args()
+
+    symbols = parse_symbols()
+    src = BinanceSource(args.rest_url) if args.rest_url else BinanceSource()
+    hooks: List[Callable[[str, Dict[str, Any]], None]] = []
+    if args.bars:
+        from resample import BarWriter
+        hooks.append(BarWriter(args.data))
+    if args.predict:
+        # التوقع يجلب بيانات ويكتب ملفات: نشغله خارج الـ event loop
+        pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="predict")
+        hooks.append(slot_closer(HORIZONS_DEFAULT, lambda sym, h: pool.submit(predict_for_symbol, sym, h)))
+
+    def on_candle(symbol: str, candle: Dict[str, Any]) -> None:
+        for hook in hooks:
+            hook(symbol, candle)
+
+    ing = KlineIngester(
+        symbols,
+        CandleHistory(args.data),
+        ws_base=args.ws_url,
+        rest=lambda sym, n: src.klines_1m(sym, n, PRIORITY_PREDICT),
+        on_candle=on_candle if hooks else None,
+    )
+    try:
+        asyncio.run(ing.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
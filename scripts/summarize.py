@@ -1,51 +1,39 @@
 #!/usr/bin/env python3
-import os, json, time
+import os, json, glob, re
 
-BASES = ["BTC","ETH","XRP","BNB","SOL","DOGE","ADA","LTC","SHIB","PUMP"]
-SYMBOLS = [b + "USDT" for b in BASES]
+import clock
+import settings
+from fileio import atomic_write_json
+from storage import open_store
+from universe import load_symbols, shard_label, shard_of, shard_symbols
 
 HOURS_WINDOW = 24  # نافذة الملخص: آخر 24 ساعة
+DEFAULT_HORIZONS = (15, 60)  # دائماً في الملخص حتى بدون ملفات
 
-def read_jsonl(path):
-    rows = []
-    if not os.path.exists(path):
-        return rows
-    with open(path, "r", encoding="utf-8") as f:
-        for ln in f:
-            ln = ln.strip()
-            if not ln:
-                continue
-            try:
-                rows.append(json.loads(ln))
-            except json.JSONDecodeError:
-                continue
-    return rows
-
-def compute_hit_rate(rows):
+# مع --shard i/N كل shard يكتب جزءه هنا، ثم "summarize.py merge" يجمعها في summary.json
+SHARDS_DIR = "shards"
+SHARD_FILE_RE = re.compile(r"^summary-(\d+)-of-(\d+)\.json$")
+
+# كل جزء يحمل run (SUMMARY_RUN_ID أو GITHUB_RUN_ID) و generated_at. عند الدمج، الجزء
+# من run آخر، أو الأقدم من أحدث جزء بأكثر من SUMMARY_MAX_SKEW_MIN، يُعامل كمفقود.
+MAX_SKEW_MIN = float(os.getenv("SUMMARY_MAX_SKEW_MIN", "30"))
+
+
+def run_id():
+    return os.getenv("SUMMARY_RUN_ID") or os.getenv("GITHUB_RUN_ID") or None
+
+def compute_hit_rate(store, symbol, horizon):
     """
-    rows: قائمة توقعات (من 15m.jsonl أو 60m.jsonl)
     نرجع: (hit_pct, n_trades)
     نحسب فقط التوقعات:
       - outcome in ['Correct','Wrong']
       - t ضمن آخر 24 ساعة
+    العدّ نفسه يتم في طبقة التخزين (scan للأعمدة في JSONL أو aggregate في SQLite).
     """
-    now_ms = int(time.time() * 1000)
+    now_ms = clock.now_ms()
     cutoff = now_ms - HOURS_WINDOW * 60 * 60 * 1000
 
-    total = 0
-    correct = 0
-
-    for r in rows:
-        t = r.get("t")
-        outcome = r.get("outcome")
-        if t is None or outcome not in ("Correct", "Wrong"):
-            continue
-        if int(t) < cutoff:
-            continue
-
-        total += 1
-        if outcome == "Correct":
-            correct += 1
+    correct, total = store.hit_counts(symbol, horizon, cutoff)
 
     if total == 0:
         # ما في صفقات ضمن النافذة → 0% و 0 صفقة
@@ -54,57 +42,155 @@ def compute_hit_rate(rows):
     hit_pct = round((correct / total) * 100)
     return hit_pct, total
 
-def main():
-    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_root = os.path.join(root, "data")
-    os.makedirs(data_root, exist_ok=True)
+def shard_summary_path(data_root, shard):
+    i, n = shard
+    return os.path.join(data_root, SHARDS_DIR, f"summary-{i}-of-{n}.json")
 
+def write_summaries(store, data_root, symbols=None, shard=None):
     global_summary = {}
+    if symbols is None:
+        symbols = load_symbols()
 
-    for sym in SYMBOLS:
+    for sym in symbols:
         sym_dir = os.path.join(data_root, sym)
         os.makedirs(sym_dir, exist_ok=True)
 
-        path_15 = os.path.join(sym_dir, "15m.jsonl")
-        path_60 = os.path.join(sym_dir, "60m.jsonl")
-
-        rows_15 = read_jsonl(path_15)
-        rows_60 = read_jsonl(path_60)
-
-        hit15, n15 = compute_hit_rate(rows_15)
-        hit60, n60 = compute_hit_rate(rows_60)
+        # 15/60 دائماً (الواجهة تقرأ hit15/hit60)، وأي أفق آخر له ملف: hit240/n240 ...
+        h24 = {}
+        for h in store.horizons(sym, DEFAULT_HORIZONS):
+            h24[f"hit{h}"], h24[f"n{h}"] = compute_hit_rate(store, sym, h)
 
         # نكتب ملخص العملة
         sym_summary = {
             "symbol": sym,
-            "h24": {
-                "hit15": hit15,
-                "n15": n15,
-                "hit60": hit60,
-                "n60": n60
-            }
+            "h24": h24
         }
 
         out_path = os.path.join(sym_dir, "summary.json")
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(sym_summary, f, ensure_ascii=False, indent=2)
+        atomic_write_json(out_path, sym_summary, indent=2)
 
         print(f"[summarize] {sym}: h24={sym_summary['h24']}")
 
         # ملخص مختصر للصفحة الرئيسية
         global_summary[sym] = {
-            "h24": {
-                "hit15": hit15,
-                "hit60": hit60
-            }
+            "h24": {k: v for k, v in h24.items() if k.startswith("hit")}
         }
 
+    if shard is not None:
+        # جزء هذا الـ shard فقط؛ summary.json يُكتب في خطوة merge
+        part_path = shard_summary_path(data_root, shard)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        part = {"run": run_id(), "generated_at": clock.now_ms(), "symbols": global_summary}
+        atomic_write_json(part_path, part, indent=2)
+        print(f"[summarize] Wrote shard {shard_label(shard)} summary to {part_path}")
+        return
+
     # الملف العمومي للواجهة الرئيسية
     summary_path = os.path.join(data_root, "summary.json")
-    with open(summary_path, "w", encoding="utf-8") as f:
-        json.dump(global_summary, f, ensure_ascii=False, indent=2)
+    atomic_write_json(summary_path, global_summary, indent=2)
 
     print(f"[summarize] Wrote global summary to {summary_path}")
 
+def _read_part(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[summarize] WARN merge: could not read {path}: {e}")
+        return None
+    if not isinstance(doc, dict) or not isinstance(doc.get("symbols"), dict):
+        # فورمات قديم بدون run / generated_at: لا نعرف متى كُتب
+        return {"run": None, "generated_at": None, "symbols": {}, "legacy": True}
+    return doc
+
+
+def fresh_parts(parts, run=None, max_skew_ms=None):
+    """
+    parts: i -> doc. يرجع (fresh, stale) كقوائم أرقام shards.
+    المرجع: run المعطى، أو run أحدث جزء؛ بدون run نقارن generated_at.
+    """
+    if max_skew_ms is None:
+        max_skew_ms = MAX_SKEW_MIN * 60 * 1000
+    dated = [d for d in parts.values() if d.get("generated_at") is not None]
+    newest = max(dated, key=lambda d: d["generated_at"]) if dated else None
+    ref_run = run or (newest or {}).get("run")
+    fresh, stale = [], []
+    for i, doc in sorted(parts.items()):
+        if doc.get("generated_at") is None:
+            ok = False
+        elif ref_run is not None:
+            ok = doc.get("run") == ref_run
+        else:
+            ok = newest["generated_at"] - doc["generated_at"] <= max_skew_ms
+        (fresh if ok else stale).append(i)
+    return fresh, stale
+
+
+def merge_summaries(data_root, n=None):
+    """
+    يجمع data/shards/summary-<i>-of-<N>.json في data/summary.json (كتابة atomic).
+    N الافتراضي: من أحدث ملف shard. لو نقص shard، أو كان جزؤه قديماً (من run آخر)،
+    نُبقي قيم عملاته من summary.json الحالي مع WARN.
+    """
+    paths = {}
+    for path in sorted(glob.glob(os.path.join(data_root, SHARDS_DIR, "summary-*-of-*.json")), key=os.path.getmtime):
+        m = SHARD_FILE_RE.match(os.path.basename(path))
+        if m:
+            paths.setdefault(int(m.group(2)), {})[int(m.group(1))] = path
+            newest_n = int(m.group(2))
+    if not paths:
+        print("[summarize] merge: no shard summaries found")
+        return False
+    n = n or newest_n
+
+    parts = {}
+    for i, path in paths.get(n, {}).items():
+        doc = _read_part(path)
+        if doc is not None:
+            parts[i] = doc
+    fresh, stale = fresh_parts(parts, run_id())
+    if stale:
+        print(f"[summarize] WARN merge: stale shard summaries {stale} of {n} (older run), keeping their previous values")
+    found = {i: parts[i] for i in fresh}
+
+    summary_path = os.path.join(data_root, "summary.json")
+    previous = {}
+    missing = [i for i in range(n) if i not in parts]
+    if missing:
+        print(f"[summarize] WARN merge: missing shards {missing} of {n}, keeping their previous values")
+    if len(found) < n:
+        try:
+            with open(summary_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+
+    combined = {}
+    for i in range(n):
+        if i in found:
+            combined.update(found[i]["symbols"])
+        else:
+            combined.update({s: v for s, v in previous.items() if shard_of(s, n) == i})
+
+    # نفس ترتيب الـ universe، ثم أي عملات إضافية
+    order = [s for s in load_symbols() if s in combined]
+    order += [s for s in combined if s not in order]
+    atomic_write_json(summary_path, {s: combined[s] for s in order}, indent=2)
+    print(f"[summarize] merged {len(found)}/{n} shards ({len(order)} symbols) into {summary_path}")
+    return True
+
+def main(data_root=None, argv=None):
+    if data_root is None:
+        data_root = settings.data_root()
+    os.makedirs(data_root, exist_ok=True)
+
+    symbols, shard, rest = shard_symbols(argv)
+    if rest[:1] == ["merge"]:
+        merge_summaries(data_root)
+        return
+
+    with open_store(data_root) as store:
+        write_summaries(store, data_root, symbols, shard)
+
 if __name__ == "__main__":
     main()
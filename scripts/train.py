@@ -1,24 +1,28 @@
 # train.py content from earlier cell
-import sys, json, math, time
+import math
 import os
 from datetime import datetime, timedelta, timezone
-try:
-    import requests
-except ImportError:
-    os.system("python -m pip install requests -q")
-    import requests
+
+import settings
+from fileio import atomic_write_json
+from ratelimit import GOVERNOR, PRIORITY_TRAIN
+from universe import shard_symbols
 
 DAYS = int(os.environ.get("TRAIN_DAYS", "30"))
-SYMBOLS = os.environ.get("SYMBOLS", "BTCUSDT,ETHUSDT,XRPUSDT,BNBUSDT,SOLUSDT,DOGEUSDT,ADAUSDT,LTCUSDT,SHIBUSDT,PUMPUSDT").split(",")
-BINANCE = "https://api.binance.com"
+BINANCE = os.environ.get("BINANCE_BASE", "https://api.binance.com")
+HORIZONS = [int(h) for h in os.environ.get("TRAIN_HORIZONS", "15,60").split(",") if h.strip()]
 
 def fetch_klines_1m(symbol, start_ts_ms, end_ts_ms):
+    # lazy: requests (و numpy لاحقاً) فقط لأمر train، وتثبيتها مسؤولية البيئة (pip install requests numpy)
+    import requests
     out = []
     limit = 1000
     cur_end = end_ts_ms
     while True:
         params = {"symbol": symbol, "interval": "1m", "endTime": cur_end, "limit": limit}
-        r = requests.get(BINANCE + "/api/v3/klines", params=params, timeout=15)
+        url = BINANCE + "/api/v3/klines"
+        # أقل أولوية: التدريب يأخذ ما يتبقى من الـ weight
+        r = GOVERNOR.request(url, lambda: requests.get(url, params=params, timeout=15), priority=PRIORITY_TRAIN)
         if r.status_code != 200:
             break
         data = r.json()
@@ -30,7 +34,6 @@ def fetch_klines_1m(symbol, start_ts_ms, end_ts_ms):
         if oldest_ts <= start_ts_ms or len(data) < limit:
             break
         cur_end = oldest_ts - 1
-        time.sleep(0.1)
     out = [row for row in out if start_ts_ms <= row[0] <= end_ts_ms]
     return out
 
@@ -102,7 +105,17 @@ def rsi14(closes):
         out.append( 100.0 - (100.0/(1.0+rs)) )
     return out
 
-def build_dataset(rows, horizon):
+def resample_rows(rows, timeframe):
+    # [ts, high, low, close] 1m -> نفس الشكل على إطار timeframe دقيقة (resample.py)
+    from resample import resample
+    bars = resample([{"t": r[0], "h": r[1], "l": r[2], "c": r[3]} for r in rows], timeframe)
+    return [[b["t"], b["h"], b["l"], b["c"]] for b in bars]
+
+def build_dataset(rows, horizon, timeframe=1):
+    # timeframe > 1: الـ features على bars أعلى، والأفق يتحول إلى عدد bars
+    if timeframe > 1:
+        rows = resample_rows(rows, timeframe)
+        horizon = max(1, horizon // timeframe)
     ts = [r[0] for r in rows]
     high = [r[1] for r in rows]
     low  = [r[2] for r in rows]
@@ -174,8 +187,10 @@ def run_symbol(symbol, days):
     if len(rows) < 2000:
         print(f"[WARN] not enough data for {symbol}: {len(rows)} rows")
     out_models = {}
-    for horizon in (15, 60):
-        X, y = build_dataset(rows, horizon)
+    from history import timeframe_for_horizon
+    for horizon in HORIZONS:
+        tf = timeframe_for_horizon(horizon)
+        X, y = build_dataset(rows, horizon, tf)
         if len(y) < 200:
             print(f"[WARN] few samples {symbol} H{horizon}: {len(y)}")
             continue
@@ -184,21 +199,19 @@ def run_symbol(symbol, days):
         model = {
             "features": ["rsi","ema5_slope","ema15_slope","momentum","lastRet","sigma"],
             "W": W, "b": b, "scaler": {"mu": mu, "sd": sd},
-            "meta": {"trained_at": datetime.now(timezone.utc).isoformat(), "symbol":symbol, "horizon":horizon, "n_samples": len(y)}
+            "meta": {"trained_at": datetime.now(timezone.utc).isoformat(), "symbol":symbol, "horizon":horizon, "timeframe": tf, "n_samples": len(y)}
         }
         out_models[horizon] = model
-        folder = os.path.join("data","models",symbol)
+        folder = os.path.join(settings.data_root(),"models",symbol)
         ensure_dir(folder)
-        with open(os.path.join(folder, f"{horizon}m.json"), "w", encoding="utf-8") as f:
-            json.dump(model, f, indent=2)
+        atomic_write_json(os.path.join(folder, f"{horizon}m.json"), model, indent=2)
         print(f"[OK] {symbol} H{horizon} -> data/models/{symbol}/{horizon}m.json (n={len(y)})")
     return out_models
 
 def main():
-    ensure_dir(os.path.join("data","models"))
-    for sym in SYMBOLS:
-        sym = sym.strip()
-        if not sym: continue
+    ensure_dir(os.path.join(settings.data_root(),"models"))
+    symbols, _, _ = shard_symbols()  # SYMBOLS أو config/universe.json، مع --shard i/N
+    for sym in symbols:
         try:
             run_symbol(sym, DAYS)
         except Exception as e:
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+universe.py
+
+قائمة العملات المشتركة لكل السكربتات (predict / evaluate / summarize / train / fetch_history)
++ تقسيمها إلى shards لتشغيلها على عدة processes أو runners.
+
+مصدر القائمة (بالترتيب):
+  1) متغير البيئة SYMBOLS = "BTCUSDT,ETHUSDT,..."
+  2) ملف UNIVERSE_FILE (الافتراضي config/universe.json)، وهو واحد من:
+       - ["BTCUSDT", ...]  أو  {"symbols": ["BTCUSDT", ...]}
+       - snapshot من Binance exchangeInfo (python scripts/universe.py snapshot)
+         نأخذ منه أزواج QUOTE (USDT) بحالة TRADING، وحدّها UNIVERSE_MAX لو موجود.
+  3) DEFAULT_BASES أدناه.
+
+التقسيم: --shard i/N (أو SHARD=i/N)، i من 0 إلى N-1. كل عملة تذهب لـ shard ثابت
+عبر hash مستقر (blake2b وليس hash() الخاص ببايثون) فلا تتغير بين التشغيلات.
+
+التشغيل:
+  python scripts/universe.py                    # طباعة القائمة
+  python scripts/universe.py --shard 1/4        # عملات shard واحد
+  python scripts/universe.py snapshot           # حفظ exchangeInfo في data/exchange_info.json
+"""
+
+import hashlib
+import json
+import os
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BASES = ["BTC", "ETH", "XRP", "BNB", "SOL", "DOGE", "ADA", "LTC", "SHIB", "PUMP"]
+QUOTE = "USDT"
+UNIVERSE_FILE = os.path.join(ROOT, "config", "universe.json")
+SNAPSHOT_FILE = os.path.join(ROOT, "data", "exchange_info.json")
+
+Shard = Tuple[int, int]
+
+
+# ----------------- القائمة -----------------
+
+
+def _dedupe(symbols) -> List[str]:
+    out: List[str] = []
+    for s in symbols:
+        s = str(s).strip().upper()
+        if s and s not in out:
+            out.append(s)
+    return out
+
+
+def symbols_from_doc(doc, quote: str = QUOTE, limit: Optional[int] = None) -> List[str]:
+    """
+    يقبل list أو {"symbols": [...]} أو exchangeInfo كامل.
+    """
+    items = doc.get("symbols", []) if isinstance(doc, dict) else doc
+    out = []
+    for it in items or []:
+        if isinstance(it, dict):
+            # exchangeInfo: نتجاهل الأزواج الموقوفة أو بعملة تسعير أخرى
+            if it.get("status", "TRADING") != "TRADING" or it.get("quoteAsset", quote) != quote:
+                continue
+            it = it.get("symbol")
+        if it:
+            out.append(it)
+    out = _dedupe(out)
+    return out[:limit] if limit else out
+
+
+def load_symbols(path: Optional[str] = None) -> List[str]:
+    env = os.getenv("SYMBOLS")
+    if env:
+        return _dedupe(env.split(","))
+
+    path = path or os.getenv("UNIVERSE_FILE") or UNIVERSE_FILE
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            limit = int(os.getenv("UNIVERSE_MAX", "0")) or None
+            symbols = symbols_from_doc(doc, limit=limit)
+            if symbols:
+                return symbols
+        except (OSError, ValueError) as e:
+            print(f"[universe] WARN could not read {path}: {e}")
+
+    return [b + QUOTE for b in DEFAULT_BASES]
+
+
+def base_of(symbol: str) -> str:
+    return symbol[: -len(QUOTE)] if symbol.endswith(QUOTE) else symbol
+
+
+# ----------------- shards -----------------
+
+
+def parse_shard(text: Optional[str]) -> Optional[Shard]:
+    """
+    "1/4" -> (1, 4). فارغ أو "0/1" -> None (بدون تقسيم).
+    """
+    if not text:
+        return None
+    try:
+        i, n = (int(x) for x in str(text).split("/", 1))
+    except ValueError:
+        raise ValueError(f"bad shard {text!r} (expected i/N)")
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"bad shard {text!r}: need 0 <= i < N")
+    return None if n == 1 else (i, n)
+
+
+def shard_of(symbol: str, n: int) -> int:
+    digest = hashlib.blake2b(symbol.upper().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % n
+
+
+def select(symbols: Sequence[str], shard: Optional[Shard]) -> List[str]:
+    if shard is None:
+        return list(symbols)
+    i, n = shard
+    return [s for s in symbols if shard_of(s, n) == i]
+
+
+def split_shard_args(argv: Sequence[str]) -> Tuple[Optional[Shard], List[str]]:
+    """
+    يستخرج --shard i/N (أو --shard=i/N) من argv ويرجع باقي الـ arguments.
+    بدونه يُقرأ متغير البيئة SHARD.
+    """
+    rest: List[str] = []
+    text = None
+    it = iter(argv)
+    for a in it:
+        if a == "--shard":
+            text = next(it, None)
+        elif a.startswith("--shard="):
+            text = a.split("=", 1)[1]
+        else:
+            rest.append(a)
+    return parse_shard(text or os.getenv("SHARD")), rest
+
+
+def shard_symbols(argv: Optional[Sequence[str]] = None) -> Tuple[List[str], Optional[Shard], List[str]]:
+    """
+    الاستخدام المعتاد في السكربتات:
+      symbols, shard, rest = shard_symbols(sys.argv[1:])
+    """
+    shard, rest = split_shard_args(sys.argv[1:] if argv is None else argv)
+    return select(load_symbols(), shard), shard, rest
+
+
+def shard_label(shard: Optional[Shard]) -> str:
+    return "all" if shard is None else f"{shard[0]}/{shard[1]}"
+
+
+# ----------------- snapshot -----------------
+
+
+def save_snapshot(path: str = SNAPSHOT_FILE) -> int:
+    from fileio import atomic_write_json
+    from ratelimit import PRIORITY_HISTORY, urlopen_json
+
+    base = os.getenv("BINANCE_BASE", "https://api.binance.com").rstrip("/")
+    doc = urlopen_json(base + "/api/v3/exchangeInfo", PRIORITY_HISTORY, weight=20)
+    atomic_write_json(path, {"symbols": doc.get("symbols", [])})
+    return len(symbols_from_doc(doc))
+
+
+def main() -> None:
+    shard, rest = split_shard_args(sys.argv[1:])
+    if rest[:1] == ["snapshot"]:
+        n = save_snapshot()
+        print(f"[universe] saved {SNAPSHOT_FILE} ({n} {QUOTE} pairs trading)")
+        print(f"[universe] use it with UNIVERSE_FILE={SNAPSHOT_FILE}")
+        return
+    for s in select(load_symbols(), shard):
+        print(s)
+
+
+if __name__ == "__main__":
+    main()
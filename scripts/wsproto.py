@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+wsproto.py
+
+تطبيق صغير لبروتوكول WebSocket (RFC 6455) فوق asyncio بدون مكتبات خارجية.
+يكفي لاستقبال stream الشموع من Binance ولخادم الاختبار في fake_exchange.
+
+- connect(url): عميل ws:// أو wss://
+- encode_frame / read_frame_sync: يستخدمها الخادم المحلي (threads)
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import ssl
+import struct
+from typing import Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+MAX_MESSAGE_BYTES = 8 * 1024 * 1024
+
+
+class ConnectionClosed(ConnectionError):
+    pass
+
+
+def accept_key(key: str) -> str:
+    digest = hashlib.sha1((key + GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def _mask(payload: bytes, key: bytes) -> bytes:
+    if not payload:
+        return payload
+    # XOR على int كبير أسرع بكثير من حلقة بايت-بايت
+    n = len(payload)
+    k = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(k, "big")).to_bytes(n, "big")
+
+
+def encode_frame(opcode: int, payload: bytes, mask: bool) -> bytes:
+    head = bytearray([0x80 | opcode])
+    n = len(payload)
+    mbit = 0x80 if mask else 0
+    if n < 126:
+        head.append(mbit | n)
+    elif n < 1 << 16:
+        head.append(mbit | 126)
+        head += struct.pack("!H", n)
+    else:
+        head.append(mbit | 127)
+        head += struct.pack("!Q", n)
+    if mask:
+        key = os.urandom(4)
+        return bytes(head) + key + _mask(payload, key)
+    return bytes(head) + payload
+
+
+def _decode_header(b0: int, b1: int) -> Tuple[bool, int, bool, int]:
+    return bool(b0 & 0x80), b0 & 0x0F, bool(b1 & 0x80), b1 & 0x7F
+
+
+def read_frame_sync(rfile) -> Tuple[bool, int, bytes]:
+    """
+    يقرأ frame واحد من ملف socket متزامن. يرجع (fin, opcode, payload).
+    """
+    hdr = rfile.read(2)
+    if len(hdr) < 2:
+        raise ConnectionClosed("eof")
+    fin, opcode, masked, n = _decode_header(hdr[0], hdr[1])
+    if n == 126:
+        n = struct.unpack("!H", rfile.read(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", rfile.read(8))[0]
+    key = rfile.read(4) if masked else b""
+    payload = rfile.read(n)
+    if len(payload) < n:
+        raise ConnectionClosed("eof")
+    return fin, opcode, _mask(payload, key) if masked else payload
+
+
+class WebSocket:
+    """
+    اتصال عميل. recv() يرجع رسالة كاملة (نص أو bytes) ويرد على ping تلقائياً.
+    idle_timeout: لو لم يصل أي frame (ولا ping) خلالها نعتبر الاتصال ميتاً
+    (TCP نصف مفتوح بدون FIN) ونرمي ConnectionClosed.
+    """
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, idle_timeout: Optional[float] = None
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout
+        self.closed = False
+
+    async def _read_frame(self) -> Tuple[bool, int, bytes]:
+        try:
+            try:
+                b0, b1 = await asyncio.wait_for(self.reader.readexactly(2), self.idle_timeout)
+            except asyncio.TimeoutError as exc:
+                self.closed = True
+                raise ConnectionClosed(f"no frames for {self.idle_timeout:g}s") from exc
+            fin, opcode, masked, n = _decode_header(b0, b1)
+            if n == 126:
+                n = struct.unpack("!H", await self.reader.readexactly(2))[0]
+            elif n == 127:
+                n = struct.unpack("!Q", await self.reader.readexactly(8))[0]
+            if n > MAX_MESSAGE_BYTES:
+                raise ConnectionClosed(f"frame too large: {n}")
+            key = await self.reader.readexactly(4) if masked else b""
+            payload = await self.reader.readexactly(n)
+        except (asyncio.IncompleteReadError, ConnectionResetError) as exc:
+            self.closed = True
+            raise ConnectionClosed("connection lost") from exc
+        return fin, opcode, _mask(payload, key) if masked else payload
+
+    async def _send(self, opcode: int, payload: bytes) -> None:
+        if self.closed:
+            raise ConnectionClosed("already closed")
+        self.writer.write(encode_frame(opcode, payload, mask=True))
+        await self.writer.drain()
+
+    async def send_text(self, text: str) -> None:
+        await self._send(OP_TEXT, text.encode("utf-8"))
+
+    async def recv(self) -> Union[str, bytes]:
+        parts = []
+        msg_op = None
+        while True:
+            fin, opcode, payload = await self._read_frame()
+            if opcode == OP_PING:
+                await self._send(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                if not self.closed:
+                    try:
+                        await self._send(OP_CLOSE, payload[:2])
+                    except (ConnectionError, OSError):
+                        pass
+                self.closed = True
+                raise ConnectionClosed("closed by server")
+            if opcode != OP_CONT:
+                msg_op = opcode
+            parts.append(payload)
+            if fin:
+                data = b"".join(parts)
+                return data.decode("utf-8") if msg_op == OP_TEXT else data
+
+    async def close(self) -> None:
+        if not self.closed:
+            try:
+                await self._send(OP_CLOSE, struct.pack("!H", 1000))
+            except (ConnectionError, OSError):
+                pass
+            self.closed = True
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def connect(
+    url: str,
+    timeout: float = 10.0,
+    ssl_context: Optional[ssl.SSLContext] = None,
+    idle_timeout: Optional[float] = None,
+) -> WebSocket:
+    u = urlsplit(url)
+    secure = u.scheme == "wss"
+    port = u.port or (443 if secure else 80)
+    ctx = (ssl_context or ssl.create_default_context()) if secure else None
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(u.hostname, port, ssl=ctx, limit=MAX_MESSAGE_BYTES), timeout
+    )
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+    host = u.hostname if u.port is None else f"{u.hostname}:{u.port}"
+    req = (
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n"
+    )
+    try:
+        writer.write(req.encode("ascii"))
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionResetError) as exc:
+        # الطرف أغلق أثناء الـ handshake أو أرسل headers أطول من الحد
+        writer.close()
+        raise ConnectionClosed(f"handshake failed: {exc!r}") from exc
+    lines = head.decode("latin-1").split("\r\n")
+    if " 101 " not in lines[0] + " ":
+        writer.close()
+        raise ConnectionClosed(f"handshake failed: {lines[0]}")
+    headers = {}
+    for ln in lines[1:]:
+        if ":" in ln:
+            k, v = ln.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    if headers.get("sec-websocket-accept") != accept_key(key):
+        writer.close()
+        raise ConnectionClosed("bad Sec-WebSocket-Accept")
+    return WebSocket(reader, writer, idle_timeout)
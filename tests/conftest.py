@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# السكربتات تستورد بعضها كوحدات مسطحة (from records import ...) مثل python -m scripts
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+if SCRIPTS not in sys.path:
+    sys.path.insert(0, SCRIPTS)
+
+# شموع مسجلة للبورصة المحلية (fake_exchange): BTCUSDT لمدة 4 ساعات
+CANDLE_START_MS = 1_779_999_960_000  # على حد دقيقة
+CANDLE_COUNT = 240
+
+
+def candle_close(i: int) -> float:
+    return round(60000.0 + 25.0 * ((i * 7) % 13) - 3.0 * i, 2)
+
+
+@pytest.fixture
+def candle_root(tmp_path):
+    from history import MINUTE_MS, candle_line, history_path
+
+    root = tmp_path / "exchange"
+    path = history_path(str(root), "BTCUSDT")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(CANDLE_COUNT):
+            f.write(candle_line({"t": CANDLE_START_MS + i * MINUTE_MS, "c": candle_close(i)}))
+    return str(root)
@@ -0,0 +1,59 @@
+"""
+بوابة زمن البدء البارد لـ python -m scripts: predict --dry-run يجب أن يبقى تحت الميزانية
+ولا يحمّل المكتبات الثقيلة (requests / numpy / sqlite3).
+
+الميزانية من CLI_COLD_START_BUDGET_MS (افتراضياً 500 ms، واسعة لأجهزة CI البطيئة).
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = float(os.getenv("CLI_COLD_START_BUDGET_MS", "500"))
+RUNS = 3
+HEAVY = ("requests", "numpy", "sqlite3")
+CMD = [sys.executable, "-m", "scripts", "predict", "--dry-run"]
+
+
+def _env(tmp_path):
+    env = dict(os.environ)
+    env["DATA_ROOT"] = str(tmp_path)
+    return env
+
+
+def test_predict_dry_run_cold_start_within_budget(tmp_path):
+    env = _env(tmp_path)
+    best = float("inf")
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        proc = subprocess.run(CMD, cwd=ROOT, env=env, capture_output=True, text=True, check=False)
+        best = min(best, (time.perf_counter() - t0) * 1000)
+        assert proc.returncode == 0, proc.stderr
+    assert best <= BUDGET_MS, f"cold start {best:.0f} ms > budget {BUDGET_MS:.0f} ms"
+
+
+def test_predict_dry_run_skips_heavy_imports(tmp_path):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime"] + CMD[1:],
+        cwd=ROOT, env=_env(tmp_path), capture_output=True, text=True, check=False,
+    )
+    assert proc.returncode == 0, proc.stderr
+    # سطور "import time: self | cumulative | name"؛ الاسم بعد آخر "|"
+    loaded = {ln.rsplit("|", 1)[1].strip() for ln in proc.stderr.splitlines() if ln.startswith("import time:")}
+    assert not [m for m in HEAVY if m in loaded]
+
+
+def test_import_profile_does_not_run_side_effecting_commands(tmp_path):
+    data_root = tmp_path / "data"
+    env = dict(os.environ, DATA_ROOT=str(data_root))
+    proc = subprocess.run(
+        [sys.executable, "-m", "scripts", "--import-profile", "evaluate"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=False,
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert "import evaluate" in proc.stdout
+    # بدون --dry-run لا يُشغَّل evaluate.main: لا data/ ولا سطور [evaluate]
+    assert "[evaluate]" not in proc.stdout
+    assert not data_root.exists()
@@ -0,0 +1,58 @@
+"""
+evaluate: كل Pending مستحق يُقيَّم بالسعر مهما كان قديماً (JSONL و SQLite)،
+والذي لم يحن موعده يبقى Pending.
+"""
+
+import pytest
+
+import clock
+import evaluate
+from records import CORRECT, DOWN, PENDING, UP, WRONG, Prediction
+from storage import open_store
+
+SYMBOL = "BTCUSDT"
+HORIZON = 15
+HOUR_MS = 3600 * 1000
+NOW_MS = 1_760_000_000_000
+
+
+@pytest.fixture(params=["jsonl", "sqlite"])
+def store(request, tmp_path):
+    s = open_store(str(tmp_path), request.param)
+    yield s
+    s.close()
+
+
+def _row(rid, hours_ago, direction=UP, outcome=PENDING):
+    return Prediction(id=rid, t=NOW_MS - int(hours_ago * HOUR_MS), dir=direction, base=100.0, outcome=outcome)
+
+
+def _outcomes(store):
+    return {r.id: r.outcome for r in store.all(SYMBOL, HORIZON)}
+
+
+def test_every_due_pending_row_is_priced(store, monkeypatch):
+    for r in (_row("ancient", 24 * 30), _row("old", 72, DOWN), _row("done", 24 * 30, DOWN, CORRECT),
+              _row("due", 1), _row("fresh", 0)):
+        store.append(SYMBOL, HORIZON, r)
+    monkeypatch.setattr(evaluate, "fetch_last_close", lambda symbol: 101.0)
+
+    with clock.use_clock(clock.VirtualClock(NOW_MS / 1000)):
+        assert evaluate._evaluate_series(store, SYMBOL, HORIZON)
+        # لا شيء مستحق بعد ذلك -> لا طلب سعر
+        monkeypatch.setattr(evaluate, "fetch_last_close", lambda symbol: pytest.fail("unexpected price fetch"))
+        assert not evaluate._evaluate_series(store, SYMBOL, HORIZON)
+
+    assert _outcomes(store) == {
+        "ancient": CORRECT, "old": WRONG, "done": CORRECT, "due": CORRECT, "fresh": PENDING,
+    }
+
+
+def test_failed_price_leaves_rows_pending(store, monkeypatch):
+    store.append(SYMBOL, HORIZON, _row("due", 1))
+    monkeypatch.setattr(evaluate, "fetch_last_close", lambda symbol: None)
+
+    with clock.use_clock(clock.VirtualClock(NOW_MS / 1000)):
+        assert not evaluate._evaluate_series(store, SYMBOL, HORIZON)
+
+    assert _outcomes(store) == {"due": PENDING}
@@ -0,0 +1,71 @@
+"""
+features.batch_features مقابل run_predict.build_features على سلاسل عشوائية.
+
+التطابق ضمن خطأ التقريب وليس bit-for-bit: الجمع في numpy وفي Python قد يختلف
+بـ ~1 ULP (لوحظ في sigma)، فنقارن بـ REL_TOL / ABS_TOL أدناه.
+"""
+
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from features import FEATURE_KEYS, batch_features, close_matrix, feature_rows  # noqa: E402
+from run_predict import build_features  # noqa: E402
+
+REL_TOL = 1e-12
+ABS_TOL = 1e-15
+LENGTHS = (1, 2, 14, 15, 16, 59, 60, 61, 120)
+
+
+def _walk(rng, n):
+    p = rng.uniform(0.001, 70000.0)
+    out = []
+    for _ in range(n):
+        p *= 1.0 + rng.gauss(0.0, 0.003)
+        out.append(p)
+    return out
+
+
+def _series(seed=7, per_length=40):
+    rng = random.Random(seed)
+    series = [_walk(rng, n) for n in LENGTHS for _ in range(per_length)]
+    # سلاسل ثابتة: sigma = 0 -> SIGMA_FLOOR، ولا خسائر في RSI
+    series += [[100.0] * n for n in LENGTHS]
+    return series
+
+
+def _assert_close(got, want, where):
+    for k in FEATURE_KEYS:
+        assert math.isclose(got[k], want[k], rel_tol=REL_TOL, abs_tol=ABS_TOL), (where, k, got[k], want[k])
+
+
+def test_batch_matches_build_features():
+    series = _series()
+    rows = feature_rows(batch_features(*close_matrix(series)))
+    assert len(rows) == len(series)
+    for i, (closes, got) in enumerate(zip(series, rows)):
+        _assert_close(got, build_features(closes), (i, len(closes)))
+
+
+def test_lengths_default_to_non_nan_count():
+    m, lengths = close_matrix(_series(seed=11, per_length=5))
+    explicit = batch_features(m, lengths)
+    implicit = batch_features(m)
+    for k in FEATURE_KEYS:
+        assert np.array_equal(explicit[k], implicit[k], equal_nan=True), k
+
+
+def test_empty_rows_are_nan():
+    m, lengths = close_matrix([[], [1.0, 1.01, 0.99]])
+    feats = batch_features(m, lengths)
+    for k in FEATURE_KEYS:
+        assert math.isnan(feats[k][0]), k
+        assert not math.isnan(feats[k][1]), k
+
+
+def test_rejects_non_2d_input():
+    with pytest.raises(ValueError):
+        batch_features(np.zeros(5))
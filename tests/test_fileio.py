@@ -0,0 +1,69 @@
+"""
+اختبار ضغط لـ fileio: عدة processes تضيف توقعات بينما أخرى تعيد كتابة نفس الملف
+(set_outcomes من evaluate). لا يجب أن يضيع أو يتكرر أي صف، ولا يبقى سطر مقطوع.
+"""
+
+import json
+import multiprocessing as mp
+import os
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+from records import PENDING, WRONG, Prediction, read_predictions  # noqa: E402
+from storage import JsonlStore  # noqa: E402
+
+SYMBOL = "BTCUSDT"
+HORIZON = 15
+WRITERS = 6
+ROWS_PER_WRITER = 150
+REWRITERS = 2
+
+
+def _append_rows(data_root: str, writer: int) -> None:
+    store = JsonlStore(data_root)
+    for i in range(ROWS_PER_WRITER):
+        rid = f"w{writer}-{i}"
+        store.append(SYMBOL, HORIZON, Prediction(id=rid, t=writer * 10**6 + i, outcome=PENDING))
+
+
+def _rewrite_until(data_root: str, stop) -> None:
+    store = JsonlStore(data_root)
+    while not stop.is_set():
+        rows = store.all(SYMBOL, HORIZON)
+        # كل دورة تعيد كتابة الملف كاملاً (read-modify-write تحت قفل حصري)
+        store.set_outcomes(SYMBOL, HORIZON, {r.id: WRONG for r in rows[::3] if r.id})
+
+
+def test_appends_survive_concurrent_rewrites(tmp_path):
+    data_root = str(tmp_path)
+    ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+    stop = ctx.Event()
+    # صف أولي حتى تجد إعادة الكتابة ملفاً من البداية
+    JsonlStore(data_root).append(SYMBOL, HORIZON, Prediction(id="seed", t=0, outcome=PENDING))
+
+    rewriters = [ctx.Process(target=_rewrite_until, args=(data_root, stop)) for _ in range(REWRITERS)]
+    writers = [ctx.Process(target=_append_rows, args=(data_root, w)) for w in range(WRITERS)]
+    for p in rewriters + writers:
+        p.start()
+    for p in writers:
+        p.join(60)
+    stop.set()
+    for p in rewriters:
+        p.join(60)
+    assert all(p.exitcode == 0 for p in writers + rewriters)
+
+    path = JsonlStore(data_root).path(SYMBOL, HORIZON)
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [ln for ln in f if ln.strip()]
+    for ln in lines:
+        json.loads(ln)  # لا أسطر مقطوعة أو ملتصقة
+
+    ids = [r.id for r in read_predictions(path)]
+    expected = {"seed"} | {f"w{w}-{i}" for w in range(WRITERS) for i in range(ROWS_PER_WRITER)}
+    assert len(ids) == len(expected)
+    assert set(ids) == expected
+    # لا ملفات مؤقتة متبقية من atomic_write
+    leftovers = [n for n in os.listdir(os.path.dirname(path)) if n.endswith(".tmp")]
+    assert leftovers == []
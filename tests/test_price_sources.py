@@ -0,0 +1,104 @@
+"""
+HedgedPrices مقابل بورصتين محليتين (fake_exchange) بتأخيرات مصطنعة:
+الـ hedge ينتهي قرب زمن المزوّد السريع، الفشل ينتقل للثاني، 3 أخطاء متتالية
+تؤجل المزوّد (cooldown)، و BTCUSDT -> fsym=BTC&tsym=USD.
+"""
+
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import price_sources
+from conftest import CANDLE_COUNT, candle_close
+from fake_exchange import FakeExchange
+from price_sources import BinanceSource, CryptoCompareSource, HedgedPrices, from_cc_pair, to_cc_pair
+
+SLOW_SEC = 1.0
+LAST_CLOSE = candle_close(CANDLE_COUNT - 1)
+
+
+def _cc(ex):
+    return CryptoCompareSource(ex.base_url + "/data/v2/histominute", timeout=5)
+
+
+@pytest.fixture
+def slow(candle_root):
+    with FakeExchange(candle_root, delay=SLOW_SEC) as ex:
+        yield ex
+
+
+@pytest.fixture
+def fast(candle_root):
+    with FakeExchange(candle_root) as ex:
+        yield ex
+
+
+@pytest.fixture
+def broken(tmp_path):
+    # بدون شموع: كل طلب klines يرد 400 Invalid symbol
+    with FakeExchange(str(tmp_path / "empty")) as ex:
+        yield ex
+
+
+def test_hedge_finishes_near_fast_provider(slow, fast):
+    prices = HedgedPrices([BinanceSource(slow.base_url, timeout=5), _cc(fast)], default_delay=0.1)
+
+    t0 = time.monotonic()
+    assert prices.last_close("BTCUSDT", prefer="binance") == LAST_CLOSE
+    elapsed = time.monotonic() - t0
+
+    # hedge بعد 0.1s + رد فوري من السريع، بدل انتظار SLOW_SEC كاملة
+    assert elapsed < SLOW_SEC / 2, elapsed
+    assert prices.stats()["cryptocompare"]["ok"] == 1
+
+
+def test_failing_primary_falls_over_to_secondary(fast, broken):
+    prices = HedgedPrices([BinanceSource(broken.base_url, timeout=5), _cc(fast)], default_delay=1.0)
+
+    t0 = time.monotonic()
+    rows = prices.klines_1m("BTCUSDT", 10, prefer="binance")
+    # الفشل السريع يطلق الثاني فوراً، بدون انتظار hedge delay
+    assert time.monotonic() - t0 < 1.0
+    assert rows[-1]["c"] == LAST_CLOSE
+    assert broken.requests == 1
+    stats = prices.stats()
+    assert stats["binance"]["errors"] == 1 and stats["cryptocompare"]["ok"] == 1
+
+
+def test_three_consecutive_errors_put_provider_in_cooldown(fast, broken):
+    now = [1000.0]
+    prices = HedgedPrices(
+        [BinanceSource(broken.base_url, timeout=5), _cc(fast)], cooldown=60.0, clock=lambda: now[0],
+    )
+
+    for _ in range(3):
+        prices.last_close("BTCUSDT", prefer="binance")
+    assert broken.requests == 3
+    assert not prices.stats()["binance"]["healthy"]
+    assert [s.name for s in prices.ordered(prefer="binance")] == ["cryptocompare", "binance"]
+
+    # أثناء الـ cooldown الاحتياطي يرد أولاً فلا يُطلب المزوّد المعطّل
+    assert prices.last_close("BTCUSDT", prefer="binance") == LAST_CLOSE
+    assert broken.requests == 3
+
+    now[0] += 61.0
+    assert prices.stats()["binance"]["healthy"]
+    assert prices.ordered(prefer="binance")[0].name == "binance"
+
+
+def test_symbol_maps_to_cryptocompare_pair(fast, monkeypatch):
+    assert to_cc_pair("BTCUSDT") == ("BTC", "USD")
+    assert from_cc_pair("BTC", "USD") == "BTCUSDT"
+
+    urls = []
+    real = price_sources.urlopen_json
+
+    def spy(url, *args, **kwargs):
+        urls.append(url)
+        return real(url, *args, **kwargs)
+
+    monkeypatch.setattr(price_sources, "urlopen_json", spy)
+    assert _cc(fast).last_close("BTCUSDT") == LAST_CLOSE
+    qs = parse_qs(urlsplit(urls[0]).query)
+    assert qs["fsym"] == ["BTC"] and qs["tsym"] == ["USD"]
@@ -0,0 +1,163 @@
+"""
+Governor مقابل البورصة المحلية (fake_exchange) التي ترسل X-MBX-USED-WEIGHT-1M
+و 429 + Retry-After عند تجاوز weight_limit. الساعة مُحقنة فلا ننتظر دقائق حقيقية.
+"""
+
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import ratelimit
+from fake_exchange import FakeExchange
+from ratelimit import PRIORITY_EVALUATE, PRIORITY_HISTORY, PRIORITY_PREDICT, PRIORITY_TRAIN, Governor
+
+LIMIT = 100.0
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.t = 1000.0
+
+    def __call__(self) -> float:
+        return self.t
+
+
+def _klines_url(ex):
+    return ex.base_url + "/api/v3/klines?symbol=BTCUSDT&interval=1m&limit=5"
+
+
+def _host(ex):
+    return ex.base_url.split("://", 1)[1]
+
+
+def _send(url, seen=None):
+    def send():
+        resp = urllib.request.urlopen(url, timeout=5)
+        with resp:
+            resp.read()
+        if seen is not None:
+            seen.append(resp.headers)
+        return resp
+    return send
+
+
+def _trip_429(gov, ex):
+    """يرسل حتى أول 429 ويرجع Retry-After."""
+    url = _klines_url(ex)
+    for _ in range(10):
+        try:
+            gov.request(url, _send(url), attempts=1)
+        except urllib.error.HTTPError as e:
+            assert e.code == 429
+            return float(e.headers["Retry-After"])
+    pytest.fail("no 429 from the stub exchange")
+
+
+def _wait_for(pred, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not pred():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_429_retry_after_blocks_host(candle_root, clock):
+    with FakeExchange(candle_root, weight_limit=4) as ex:
+        gov = Governor({_host(ex): (LIMIT, 60.0)}, clock=clock)
+        retry_after = _trip_429(gov, ex)
+        snap = gov.snapshot()[_host(ex)]
+        assert snap["blocked_for"] == pytest.approx(retry_after)
+        assert snap["tokens"] == 0
+
+        sent = ex.requests
+        errors = []
+
+        def later():
+            try:
+                gov.request(_klines_url(ex), _send(_klines_url(ex)), attempts=1)
+            except urllib.error.HTTPError as e:
+                errors.append(e.code)
+
+        t = threading.Thread(target=later)
+        t.start()
+        time.sleep(0.3)
+        assert ex.requests == sent  # محجوز حتى Retry-After
+        # بعد Retry-After + نافذة كاملة ليمتلئ الـ bucket (الحد المتعلَّم أصغر)
+        clock.t += retry_after + 60.0
+        gov.observe(_klines_url(ex), None, None)  # يوقظ المنتظرين
+        t.join(5)
+        assert not t.is_alive()
+        assert ex.requests == sent + 1
+
+
+def test_used_weight_header_caps_tokens(candle_root, clock):
+    with FakeExchange(candle_root) as ex:
+        url = _klines_url(ex)
+        for _ in range(5):
+            # weight يستهلكه عميل آخر على نفس الـ IP
+            urllib.request.urlopen(url, timeout=5).close()
+        gov = Governor({_host(ex): (LIMIT, 60.0)}, clock=clock)
+        seen = []
+        gov.request(url, _send(url, seen))
+        used = float(seen[-1][ratelimit.USED_WEIGHT_HEADER])
+        assert used >= 2
+        assert gov.snapshot()[_host(ex)]["tokens"] == LIMIT - used
+
+
+def test_learned_capacity_recovers(candle_root, clock):
+    with FakeExchange(candle_root, weight_limit=4) as ex:
+        gov = Governor({_host(ex): (LIMIT, 60.0)}, clock=clock)
+        _trip_429(gov, ex)
+        learned = gov.snapshot()[_host(ex)]["capacity"]
+        assert learned < LIMIT
+
+        clock.t += ratelimit.CAPACITY_RECOVERY_SEC / 2
+        half = gov.snapshot()[_host(ex)]["capacity"]
+        assert half == pytest.approx(min(LIMIT, learned + LIMIT / 2))
+
+        clock.t += ratelimit.CAPACITY_RECOVERY_SEC
+        assert gov.snapshot()[_host(ex)]["capacity"] == LIMIT
+
+
+def test_waiters_served_in_priority_order(candle_root, clock):
+    with FakeExchange(candle_root) as ex:
+        url = _klines_url(ex)
+        host = _host(ex)
+        # bucket يتسع لطلب واحد (weight 2) كل 60 ثانية افتراضية
+        gov = Governor({host: (2.0, 60.0)}, clock=clock)
+        gov.request(url, _send(url))
+
+        order = []
+        lock = threading.Lock()
+
+        def worker(name, priority):
+            def send():
+                with lock:
+                    order.append(name)
+                return _send(url)()
+            gov.request(url, send, priority=priority)
+
+        threads = [
+            threading.Thread(target=worker, args=(name, prio))
+            for name, prio in (("train", PRIORITY_TRAIN), ("history", PRIORITY_HISTORY),
+                               ("evaluate", PRIORITY_EVALUATE), ("predict", PRIORITY_PREDICT))
+        ]
+        for t in threads:
+            t.start()
+        _wait_for(lambda: gov.snapshot()[host]["queued"] == len(threads))
+
+        for step in range(1, len(threads) + 1):
+            clock.t += 60.0
+            gov.observe(url, None, None)
+            _wait_for(lambda: len(order) == step)
+        for t in threads:
+            t.join(5)
+
+        assert order == ["predict", "evaluate", "history", "train"]
@@ -0,0 +1,46 @@
+"""
+serve: /api/summary/<SYMBOL> يقبل فقط العملات المعروفة ولا يخرج من data_root.
+"""
+
+import json
+import os
+
+import pytest
+
+from records import PENDING, Prediction
+from serve import ApiServer, DataIndex
+from storage import JsonlStore
+
+SYMBOL = "BTCUSDT"
+
+
+def _write_json(path, doc):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f)
+
+
+@pytest.fixture
+def server(tmp_path):
+    data_root = tmp_path / "data"
+    JsonlStore(str(data_root)).append(SYMBOL, 15, Prediction(id="a", t=1, outcome=PENDING))
+    _write_json(str(data_root / SYMBOL / "summary.json"), {"symbol": SYMBOL})
+    # ملفات خارج data_root يجب ألا تُقدَّم
+    _write_json(str(tmp_path / "summary.json"), {"secret": 1})
+    _write_json(str(tmp_path / "SECRET" / "summary.json"), {"secret": 2})
+    index = DataIndex(str(data_root))
+    index.refresh()
+    return ApiServer(index)
+
+
+def test_known_symbol_summary(server):
+    status, _, body, _ = server.route(f"/api/summary/{SYMBOL.lower()}", {})
+    assert status == 200
+    assert json.loads(body) == {"symbol": SYMBOL}
+
+
+@pytest.mark.parametrize("segment", ["..", "..%2Fsecret", "%2E%2E%2FSECRET", "ETHUSDT"])
+def test_unknown_or_traversing_symbol_is_404(server, segment):
+    status, _, body, _ = server.route(f"/api/summary/{segment}", {})
+    assert status == 404
+    assert b"secret" not in body
@@ -0,0 +1,63 @@
+"""
+SQLite backend: import من JSONL -> evaluate على SQLite -> import ثانٍ من JSONL القديم
+(لا يمسح النتائج) -> export إلى JSONL + summary.json للواجهة.
+"""
+
+import json
+import os
+
+import clock
+import evaluate
+from records import CORRECT, PENDING, UP, WRONG, Prediction, read_predictions
+from storage import JsonlStore, SqliteStore, default_db_path, export_static, import_jsonl
+
+SYMBOL = "BTCUSDT"
+HORIZON = 15
+HOUR_MS = 3600 * 1000
+NOW_MS = 1_760_000_000_000
+
+
+def _row(rid, hours_ago, outcome=PENDING):
+    return Prediction(id=rid, t=NOW_MS - int(hours_ago * HOUR_MS), dir=UP, conf=0.6, base=100.0, outcome=outcome)
+
+
+def _outcomes(store):
+    return {r.id: r.outcome for r in store.all(SYMBOL, HORIZON)}
+
+
+def test_import_evaluate_export_round_trip(tmp_path, monkeypatch):
+    data_root = str(tmp_path)
+    monkeypatch.setenv("SYMBOLS", SYMBOL)
+    monkeypatch.setattr(evaluate, "fetch_last_close", lambda symbol: 99.0)
+    jsonl = JsonlStore(data_root)
+    for r in (_row("due", 2), _row("decided", 3, CORRECT), _row("fresh", 0)):
+        jsonl.append(SYMBOL, HORIZON, r)
+
+    db = SqliteStore(default_db_path(data_root))
+    try:
+        assert import_jsonl(jsonl, db) == 3
+        with clock.use_clock(clock.VirtualClock(NOW_MS / 1000)):
+            assert evaluate._evaluate_series(db, SYMBOL, HORIZON)
+        assert _outcomes(db) == {"due": WRONG, "decided": CORRECT, "fresh": PENDING}
+
+        # JSONL ما زال فيه due=Pending؛ وحُسم fresh هناك بعد الـ import الأول
+        jsonl.set_outcomes(SYMBOL, HORIZON, {"fresh": CORRECT})
+        assert import_jsonl(jsonl, db) == 3
+        assert _outcomes(db) == {"due": WRONG, "decided": CORRECT, "fresh": CORRECT}
+        assert len(db.all(SYMBOL, HORIZON)) == 3
+
+        with clock.use_clock(clock.VirtualClock(NOW_MS / 1000)):
+            assert export_static(db, data_root) == 3
+    finally:
+        db.close()
+
+    exported = read_predictions(jsonl.path(SYMBOL, HORIZON))
+    assert [(r.id, r.t, r.outcome) for r in exported] == [
+        ("decided", NOW_MS - 3 * HOUR_MS, CORRECT),
+        ("due", NOW_MS - 2 * HOUR_MS, WRONG),
+        ("fresh", NOW_MS, CORRECT),
+    ]
+    with open(os.path.join(data_root, "summary.json"), encoding="utf-8") as f:
+        summary = json.load(f)
+    # 2 صحيحة من 3 محسومة ضمن 24 ساعة
+    assert summary[SYMBOL]["h24"]["hit15"] == 67
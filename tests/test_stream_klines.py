@@ -0,0 +1,97 @@
+"""
+KlineIngester مقابل البورصة المحلية: الاتصال يُقطع كل N رسالة (ws_drop_after) والساعة
+الافتراضية تتقدم أثناء الـ backoff، ومع ذلك raw_1m.jsonl يخرج بلا فجوات ولا تكرار.
+واتصال صامت (TCP نصف مفتوح) يُقطع بعد idle_timeout ويُعاد.
+"""
+
+import asyncio
+import os
+
+import wsproto
+from conftest import CANDLE_COUNT, CANDLE_START_MS
+from fake_exchange import FakeExchange
+from history import MINUTE_MS, CandleHistory, candle_line, history_path, read_candles
+from price_sources import BinanceSource
+from stream_klines import KlineIngester
+
+SYMBOL = "BTCUSDT"
+SEED = 30
+
+
+def _seed_history(candle_root, data_root, n):
+    src = read_candles(history_path(candle_root, SYMBOL))[:n]
+    path = history_path(data_root, SYMBOL)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(candle_line(c) for c in src)
+
+
+async def _run_until(ing, done, timeout):
+    task = asyncio.ensure_future(ing.run())
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not done() and loop.time() < deadline:
+        await asyncio.sleep(0.02)
+    ing.stop()
+    await asyncio.wait_for(task, 5)
+
+
+def test_reconnects_and_backfills_without_gaps(candle_root, tmp_path):
+    data_root = str(tmp_path / "data")
+    _seed_history(candle_root, data_root, SEED)
+    # آخر شمعة قد لا تصل (REST يستبعد آخر kline كمفتوحة)
+    target = CANDLE_START_MS + (CANDLE_COUNT - 2) * MINUTE_MS
+
+    with FakeExchange(candle_root, replay_speed=0.01, ws_drop_after=5) as ex:
+        history = CandleHistory(data_root)
+        rest = BinanceSource(ex.base_url, timeout=5)
+        ing = KlineIngester(
+            [SYMBOL], history,
+            ws_base=ex.base_url.replace("http://", "ws://"),
+            rest=lambda sym, n: rest.klines_1m(sym, n),
+            max_backoff=0.1,
+            clock=lambda: ex.now_ms() / 1000,
+            idle_timeout=5.0,
+        )
+        asyncio.run(_run_until(ing, lambda: (history.last_t(SYMBOL) or 0) >= target, 30))
+
+    assert ing.connects >= 2 and ing.received >= 5 and ing.backfilled > 0
+    ts = [int(c["t"]) for c in read_candles(history_path(data_root, SYMBOL))]
+    assert ts[0] == CANDLE_START_MS and ts[-1] >= target
+    assert [b - a for a, b in zip(ts, ts[1:])] == [MINUTE_MS] * (len(ts) - 1)
+
+
+async def _silent_ws_server():
+    """يكمل الـ handshake ثم لا يرسل شيئاً ولا يغلق (مثل TCP نصف مفتوح)."""
+    async def handle(reader, writer):
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+        key = next(ln.split(":", 1)[1].strip() for ln in head.split("\r\n") if ln.lower().startswith("sec-websocket-key:"))
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {wsproto.accept_key(key)}\r\n\r\n".encode("ascii")
+        )
+        await writer.drain()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_silent_connection_times_out_and_reconnects(tmp_path):
+    async def scenario():
+        server = await _silent_ws_server()
+        port = server.sockets[0].getsockname()[1]
+        ing = KlineIngester(
+            [SYMBOL], CandleHistory(str(tmp_path)),
+            ws_base=f"ws://127.0.0.1:{port}",
+            rest=lambda sym, n: [],
+            max_backoff=0.1,
+            idle_timeout=0.2,
+        )
+        await _run_until(ing, lambda: ing.connects >= 2, 10)
+        server.close()
+        return ing.connects
+
+    assert asyncio.run(scenario()) >= 2